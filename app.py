@@ -1,80 +1,407 @@
 # app.py
 import os
+import atexit
+import base64
 import csv
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import math
+import mmap
+import re
 import smtplib
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from email.message import EmailMessage
-from flask import Flask, Response, request, redirect, url_for
+from urllib.parse import quote, urlsplit
+import click
+from werkzeug.exceptions import NotFound
+from werkzeug.http import parse_accept_header, parse_etags
+from flask import Flask, Response, current_app, has_request_context, request, redirect, url_for, send_file, send_from_directory
+from flask.cli import with_appcontext
 
 # -------------------------------------------------
-# Find a 'static' folder (case-insensitive) near app.py
+# Configuration. Importing this module does no I/O: create_app() applies the config and
+# scans STATIC_DIR once (before fork, under a preloading server); content versions are
+# published, and CDN purges sent, only by a process that serves requests.
+# When GOPARTNERR_STATIC_DIR is unset, static files are served from BASE_DIR/static.
 # -------------------------------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def find_static_dir():
-    candidates = []
-    for up in range(0, 4):
-        root = BASE_DIR
-        for _ in range(up):
-            root = os.path.dirname(root)
-        for name in ("static", "Static", "STATIC"):
-            candidates.append(os.path.join(root, name))
-    for c in candidates:
-        if os.path.isdir(c):
-            return c
-    return os.path.join(BASE_DIR, "static")
-
-STATIC_DIR = find_static_dir()
-app = Flask(__name__, static_folder=STATIC_DIR, static_url_path="/static")
-
-# Pick the first logo that actually exists
-LOGO_CANDIDATES = ["logo.png","Logo.png","logo.jpeg","Logo.jpeg","logo.jpg","Logo.jpg"]
-for _cand in LOGO_CANDIDATES:
-    if os.path.isfile(os.path.join(STATIC_DIR, _cand)):
-        LOGO_FILE = _cand
-        break
-else:
-    LOGO_FILE = "logo.png"
-
-# --- Background video detection ---
-def find_video_file():
-    preferred = [
-        "Background.mp4","background.mp4",
-        "Background.mov","background.mov",
-        "Background.webm","background.webm",
-        "Background.MP4","Background.MP4",
-        "Background.MOV","Background.MOV",
-        "Background.WEBM","Background.WEBM",
-    ]
-    for name in preferred:
-        if os.path.isfile(os.path.join(STATIC_DIR, name)):
-            return name
+def default_config():
+    env = os.environ.get
+    return {
+        "STATIC_DIR": env("GOPARTNERR_STATIC_DIR", os.path.join(BASE_DIR, "static")),
+        "TENANTS": env("GOPARTNERR_TENANTS"),                 # JSON registry of white-label sites
+        "CACHE_DIR": env("GOPARTNERR_CACHE_DIR", os.path.join(BASE_DIR, ".cache")),
+        "ANALYTICS_DIR": env("GOPARTNERR_ANALYTICS_DIR"),     # default: CACHE_DIR/analytics
+        "LEADS_CSV": env("GOPARTNERR_LEADS_CSV", "leads.csv"),
+        "ADMIN_TOKEN": env("GOPARTNERR_ADMIN_TOKEN"),
+        "BASE_URL": env("GOPARTNERR_BASE_URL", "http://localhost/"),
+        "WARMUP": env("GOPARTNERR_WARMUP", "background"),     # "0", "sync" or "background"
+        "DIAGNOSTICS": env("GOPARTNERR_DIAGNOSTICS", "0") != "0",
+        "PROFILING": env("GOPARTNERR_PROFILING", "0") != "0",
+        "BUNDLE": env("GOPARTNERR_BUNDLE"),                   # serve pages/assets from a built bundle
+        "RELATED_K": int(env("GOPARTNERR_RELATED_K", "3")),
+        "TO_EMAIL": env("GOPARTNERR_TO", "info@gopartnerr.com"),
+        "SMTP_HOST": env("GOPARTNERR_SMTP_HOST"),
+        "SMTP_PORT": int(env("GOPARTNERR_SMTP_PORT", "587")),
+        "SMTP_USER": env("GOPARTNERR_SMTP_USER"),
+        "SMTP_PASS": env("GOPARTNERR_SMTP_PASS"),
+        "SMTP_STARTTLS": env("GOPARTNERR_SMTP_STARTTLS", "1") != "0",
+        "SMTP_CONNECT_TIMEOUT": float(env("GOPARTNERR_SMTP_CONNECT_TIMEOUT", "5")),
+        "SMTP_TIMEOUT": float(env("GOPARTNERR_SMTP_TIMEOUT", "10")),
+        "SMTP_BREAKER_THRESHOLD": int(env("GOPARTNERR_SMTP_BREAKER_THRESHOLD", "3")),
+        "SMTP_BREAKER_RESET": float(env("GOPARTNERR_SMTP_BREAKER_RESET", "60")),
+        "LEAD_BATCH_SIZE": int(env("GOPARTNERR_LEAD_BATCH_SIZE", "50")),
+        "LEAD_FLUSH_INTERVAL": float(env("GOPARTNERR_LEAD_FLUSH_INTERVAL", "1")),
+        "LEAD_WEBHOOK_URL": env("GOPARTNERR_LEAD_WEBHOOK"),
+        "LEAD_WEBHOOK_TOKEN": env("GOPARTNERR_LEAD_WEBHOOK_TOKEN"),
+        "LEAD_WEBHOOK_TIMEOUT": float(env("GOPARTNERR_LEAD_WEBHOOK_TIMEOUT", "10")),
+        "LEAD_WEBHOOK_BREAKER_THRESHOLD": int(env("GOPARTNERR_LEAD_WEBHOOK_BREAKER_THRESHOLD", "3")),
+        "LEAD_WEBHOOK_BREAKER_RESET": float(env("GOPARTNERR_LEAD_WEBHOOK_BREAKER_RESET", "60")),
+        "PARTIAL_NAV": env("GOPARTNERR_PARTIAL_NAV", "0") == "1",
+        "SPECULATION_EAGERNESS": env("GOPARTNERR_SPECULATION", "moderate"),  # immediate|eager|moderate|conservative|off
+        "SPECULATION_ACTION": env("GOPARTNERR_SPECULATION_ACTION", "prefetch"),  # or prerender
+        "SPECULATION_MAX": int(env("GOPARTNERR_SPECULATION_MAX", "4")),
+        "PURGE_URL": env("GOPARTNERR_PURGE_URL"),
+        "EDGE_TTL": int(env("GOPARTNERR_EDGE_TTL", "14400")),
+        "SHARED_PAGE_CACHE": env("GOPARTNERR_SHARED_PAGE_CACHE", "1") != "0",
+        "STALE_WHILE_REVALIDATE": env("GOPARTNERR_STALE_WHILE_REVALIDATE", "0") != "0",
+        "SW_MAX_ASSET": int(env("GOPARTNERR_SW_MAX_ASSET", str(1024 * 1024))),
+        "ADMISSION": env("GOPARTNERR_ADMISSION", ""),         # "class=limit/queue,..." or "0" for off
+        "ADMISSION_WAIT": float(env("GOPARTNERR_ADMISSION_WAIT", "0.5")),
+        "ADMISSION_RETRY_AFTER": env("GOPARTNERR_ADMISSION_RETRY_AFTER", "2"),
+        "ANALYTICS_FLUSH": float(env("GOPARTNERR_ANALYTICS_FLUSH", "30")),
+    }
+
+# Config keys that configure() copies unchanged to the module global of the same name
+SETTINGS = ("RELATED_K", "TO_EMAIL", "SMTP_HOST", "SMTP_PORT", "SMTP_USER", "SMTP_PASS", "SMTP_STARTTLS",
+            "SMTP_CONNECT_TIMEOUT", "SMTP_TIMEOUT", "SMTP_BREAKER_THRESHOLD", "SMTP_BREAKER_RESET",
+            "LEAD_BATCH_SIZE", "LEAD_FLUSH_INTERVAL", "LEAD_WEBHOOK_URL", "LEAD_WEBHOOK_TOKEN", "LEAD_WEBHOOK_TIMEOUT",
+            "LEAD_WEBHOOK_BREAKER_THRESHOLD", "LEAD_WEBHOOK_BREAKER_RESET",
+            "PARTIAL_NAV", "SPECULATION_EAGERNESS", "SPECULATION_ACTION", "SPECULATION_MAX", "PURGE_URL", "EDGE_TTL",
+            "SHARED_PAGE_CACHE", "STALE_WHILE_REVALIDATE", "SW_MAX_ASSET", "ADMISSION_WAIT", "ADMISSION_RETRY_AFTER",
+            "ANALYTICS_FLUSH")
+
+STATIC_DIR = CACHE_DIR = None    # set by create_app()
+
+# Routes, hooks and CLI commands are collected here and attached in create_app()
+_ROUTES, _HOOKS, _COMMANDS = [], [], []
+
+def route(rule, **options):
+    def register(view):
+        _ROUTES.append((rule, view, options))
+        return view
+    return register
+
+def hook(kind):
+    def register(fn):
+        _HOOKS.append((kind, fn))
+        return fn
+    return register
+
+def command(cmd):
+    _COMMANDS.append(cmd)
+    return cmd
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server, no locking needed
+    fcntl = None
+
+@contextmanager
+def file_lock(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl: fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl: fcntl.flock(f, fcntl.LOCK_UN)
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+# -------------------------------------------------
+# Asset manifest: one scandir pass over STATIC_DIR, content-hashed URLs. Digests are
+# cached by (mtime, size), so only new or changed files are re-hashed at startup.
+# -------------------------------------------------
+ASSET_MAX_AGE = 31536000
+VIDEO_EXTS = (".mp4", ".mov", ".webm")
+
+def build_asset_manifest(static_dir, cache_path=None):
     try:
-        for f in os.listdir(STATIC_DIR):
-            lower = f.lower()
-            if "background" in lower and os.path.splitext(lower)[1] in (".mp4",".mov",".webm"):
-                return f
-        for f in os.listdir(STATIC_DIR):
-            if os.path.splitext(f.lower())[1] in (".mp4",".mov",".webm"):
-                return f
-    except Exception:
-        pass
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, TypeError, ValueError):
+        cached = {}
+    manifest = {}
+    pending = [("", static_dir)]
+    while pending:
+        prefix, folder = pending.pop()
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            continue
+        for e in entries:
+            name = prefix + e.name
+            if e.is_dir():
+                pending.append((name + "/", e.path))
+                continue
+            if not e.is_file() or e.name.startswith("."):
+                continue
+            st = e.stat()
+            hit = cached.get(name)
+            if hit and hit["mtime"] == st.st_mtime and hit["size"] == st.st_size:
+                digest = hit["digest"]
+            else:
+                h = hashlib.sha256()
+                with open(e.path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+                digest = h.hexdigest()[:16]
+            manifest[name] = {"name": name, "path": e.path, "size": st.st_size,
+                              "mtime": st.st_mtime, "digest": digest}
+    digests = {name: {k: entry[k] for k in ("mtime", "size", "digest")} for name, entry in manifest.items()}
+    if cache_path and digests != cached:
+        try:
+            write_atomic(cache_path, json.dumps(digests).encode("utf-8"))
+        except OSError:
+            pass
+    return manifest
+
+def pick_logo(manifest):
+    for cand in ("logo.png", "logo.jpeg", "logo.jpg"):
+        matches = sorted((n for n in manifest if n.lower() == cand), reverse=True)
+        if matches:
+            return matches[0]
+    return "logo.png"
+
+def pick_video(manifest):
+    videos = sorted((n for n in manifest if os.path.splitext(n.lower())[1] in VIDEO_EXTS),
+                    key=lambda n: (VIDEO_EXTS.index(os.path.splitext(n.lower())[1]), n))
+    for n in videos:
+        if os.path.splitext(n.lower())[0] == "background":
+            return n
+    for n in videos:
+        if "background" in n.lower():
+            return n
+    return videos[0] if videos else None
+
+def find_asset(site, name):
+    # The manifest name a reference resolves to, matching case-insensitively (URLs
+    # are case-sensitive, so "CCTV.png" would 404 against cctv.png); None when the
+    # file doesn't exist. Misses are remembered for check-assets and the warmup log.
+    if name in site.assets:
+        return name
+    found = site.asset_names.get(name.lower())
+    site.bad_refs.setdefault(name, found)
+    return found
+
+def pick_asset(site, *names):
+    # First of the candidates that exists, e.g. an image and its fallbacks
+    for name in names:
+        found = find_asset(site, name) if name else None
+        if found:
+            return found
+    return None
+
+def service_image(site, slug):
+    # No image rather than the full-size logo when neither exists
+    return pick_asset(site, site.service_images.get(slug), "symbol.png")
+
+def static_url(filename):
+    site = tenant()
+    entry = site.assets.get(find_asset(site, filename) or filename)
+    if entry is None:
+        return url_for("static", filename=filename)
+    return url_for("asset", digest=entry["digest"], filename=entry["name"])
+
+_STATIC_REF = re.compile(r"""(?<=['"(])/static/([^'")\s?#]+)""")
+_STATIC_IMG = re.compile(r"""<img\b[^>]*?\bsrc\s*=\s*(['"])/static/([^'"?#]+)\1[^>]*>""", re.I)
+_FIGURE = re.compile(r"<figure\b.*?</figure>", re.I | re.S)
+
+def rewrite_static_refs(html):
+    # Hard-coded /static/... references inside content HTML get the hashed URL too.
+    # Images whose file doesn't exist are dropped, with their <figure>, instead of 404ing.
+    site = tenant()
+    present = lambda m: all(find_asset(site, i.group(2)) for i in _STATIC_IMG.finditer(m.group(0)))
+    html = _FIGURE.sub(lambda m: m.group(0) if present(m) else "", html)
+    html = _STATIC_IMG.sub(lambda m: m.group(0) if present(m) else "", html)
+    return _STATIC_REF.sub(lambda m: static_url(m.group(1)), html)
+
+# -------------------------------------------------
+# Image index: intrinsic dimensions (from file headers), dominant colour and a
+# tiny blurred placeholder. Cached in CACHE_DIR by mtime. Pillow is optional and
+# only needed for colour/placeholder.
+# -------------------------------------------------
+try:
+    from PIL import Image, ImageFilter
+except ImportError:
+    Image = None
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def image_size(path):
+    # Returns (width, height, may_have_alpha) or None
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            w, h = struct.unpack(">II", head[16:24])
+            return w, h, head[25] in (3, 4, 6)
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            w, h = struct.unpack("<HH", head[6:10])
+            return w, h, True
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+            chunk = head[12:16]
+            if chunk == b"VP8 ":
+                w, h = struct.unpack("<HH", head[26:30])
+                return w & 0x3FFF, h & 0x3FFF, False
+            if chunk == b"VP8L":
+                b = head[21:25]
+                return (1 + (((b[1] & 0x3F) << 8) | b[0]),
+                        1 + (((b[3] & 0x0F) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6)), True)
+            if chunk == b"VP8X":
+                return (1 + int.from_bytes(head[24:27], "little"),
+                        1 + int.from_bytes(head[27:30], "little"), bool(head[20] & 0x10))
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            while True:
+                byte = f.read(1)
+                if not byte:
+                    return None
+                if byte != b"\xff":
+                    continue
+                marker = f.read(1)
+                while marker == b"\xff":
+                    marker = f.read(1)
+                if not marker:
+                    return None
+                m = marker[0]
+                if m in _JPEG_SOF:
+                    f.read(3)
+                    h, w = struct.unpack(">HH", f.read(4))
+                    return w, h, False
+                if m in (0x01, 0xD8) or 0xD0 <= m <= 0xD7:
+                    continue
+                seg = f.read(2)
+                if len(seg) < 2:
+                    return None
+                f.seek(struct.unpack(">H", seg)[0] - 2, 1)
     return None
 
-VIDEO_FILE = find_video_file()
+def image_preview(path):
+    if Image is None:
+        return None, None
+    try:
+        with Image.open(path) as im:
+            im.draft("RGB", (64, 64))
+            small = im.convert("RGB")
+            small.thumbnail((16, 16))
+            color = "#%02x%02x%02x" % small.resize((1, 1), Image.BOX).getpixel((0, 0))
+            blurred = small.filter(ImageFilter.GaussianBlur(1))
+            for fmt, mime in (("WEBP", "image/webp"), ("JPEG", "image/jpeg")):
+                buf = io.BytesIO()
+                try:
+                    blurred.save(buf, fmt, quality=40)
+                except (KeyError, OSError):
+                    continue
+                return color, f"data:{mime};base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+            return color, None
+    except Exception:
+        return None, None
+
+def build_image_index(manifest, cache_path):
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+    index = {}
+    for name, entry in manifest.items():
+        if os.path.splitext(name.lower())[1] not in IMAGE_EXTS:
+            continue
+        hit = cached.get(name)
+        if (hit and hit["mtime"] == entry["mtime"] and hit["size"] == entry["size"]
+                and (hit["previewed"] or Image is None)):
+            index[name] = hit
+            continue
+        try:
+            dims = image_size(entry["path"])
+        except OSError:
+            dims = None
+        except (struct.error, ValueError, IndexError) as e:    # truncated or corrupt header
+            print(f"[images] skipping {name}: {e!r}", file=sys.stderr)
+            continue
+        color, lqip = image_preview(entry["path"])
+        index[name] = {
+            "mtime": entry["mtime"], "size": entry["size"],
+            "width": dims[0] if dims else None, "height": dims[1] if dims else None,
+            "alpha": dims[2] if dims else True,
+            "color": color, "lqip": lqip, "previewed": Image is not None,
+        }
+    if index != cached:
+        try:
+            write_atomic(cache_path, json.dumps(index).encode("utf-8"))
+        except OSError:
+            pass
+    return index
+
+def img_attrs(name):
+    meta = tenant().images.get(name)
+    if not meta or not meta["width"]:
+        return ""
+    return f' width="{meta["width"]}" height="{meta["height"]}"'
+
+def img_placeholder(name):
+    # Opaque images only: a placeholder would show through transparent regions
+    meta = tenant().images.get(name)
+    if not meta or meta["alpha"] or not meta["color"]:
+        return ""
+    bg = f"background:{meta['color']}"
+    if meta["lqip"]:
+        bg += f" url({meta['lqip']}) center/cover no-repeat"
+    return bg + ";"
 
 def _video_mime(fname: str) -> str:
     ext = os.path.splitext(fname)[1].lower()
     return {".mp4": "video/mp4", ".mov": "video/quicktime", ".webm": "video/webm"}.get(ext, "video/mp4")
 
 # --- Startup diagnostics ---
-print("\n=== Static check ===")
-print("Base dir:", BASE_DIR)
-print("Static path:", STATIC_DIR, "| exists:", os.path.isdir(STATIC_DIR))
-print("Using logo:", LOGO_FILE, "| exists:", os.path.isfile(os.path.join(STATIC_DIR, LOGO_FILE)))
-print("Video file:", VIDEO_FILE)
-print("====================\n")
+def print_diagnostics():
+    out = sys.stderr
+    print("\n=== Static check ===", file=out)
+    print("Base dir:", BASE_DIR, file=out)
+    for site in TENANTS.values():
+        print(f"[{site.name}] hosts:", ", ".join(site.hosts) or "(any)", file=out)
+        print("Static path:", site.static_dir, "| exists:", os.path.isdir(site.static_dir), file=out)
+        print("Using logo:", site.logo_file, "| exists:", site.logo_file in site.assets, file=out)
+        print("Video file:", site.video_file, file=out)
+        print("Hashed assets:", len(site.assets), file=out)
+    print("====================\n", file=out)
 
 BRAND = "ZEYATEK"
+DESCRIPTION = "GoPartnerr: Security, data, applications, and infrastructure done right."
+CONTACT = {"email": "info@gopartnerr.com", "phone": "585588202", "location": "Abu Dhabi, UAE"}
+STORIES_LABEL = "Why GoPartnerr"
 
 # ===================
 # LIGHT THEME PALETTE (+ Apple-glass surfaces)
@@ -87,6 +414,8 @@ ACCENT   = "#2aa2ff"                 # energetic blue
 ACCENT_2 = "#22c55e"                 # friendly green
 BORDER   = "rgba(12,21,38,.14)"      # subtle dark-on-light border
 SHADOW   = "0 12px 36px rgba(10,20,35,.10), inset 0 1px 0 rgba(255,255,255,.25)"
+DEFAULT_PALETTE = {"bg": BG, "surface": SURFACE, "text": TEXT, "muted": MUTED, "accent": ACCENT,
+                   "accent2": ACCENT_2, "border": BORDER, "shadow": SHADOW}
 
 # -------------------
 # Service content (long-form + outcomes + sustainability)
@@ -364,41 +693,595 @@ ARTICLES = [
 ARTICLE_BY_SLUG = {a["slug"]: a for a in ARTICLES}
 
 # -------------------
-# Email (optional). CSV saving always on.
+# Related articles: TF-IDF over tags (weighted) and title/excerpt words, top-k
+# neighbours per slug precomputed so a lookup is a dict get.
+# -------------------
+RELATED_K = None    # set by create_app()
+_STOPWORDS = set("""a an and are as at be but by for from how in into is it its not of on or so than that
+the their them then there these they this to was what when where which while who why will with without
+your you our we us more most just can""".split())
+
+class RelatedIndex:
+    def __init__(self, k=None):
+        self.k = k or RELATED_K
+        self.terms = {}      # slug -> Counter(term -> weighted tf)
+        self.digests = {}    # slug -> content digest, to detect edits
+        self.df = Counter()
+        self.postings = {}   # term -> set(slug)
+        self.vectors = {}    # slug -> {term: weight}, L2-normalised
+        self.neighbors = {}  # slug -> [slug, ...]
+
+    @staticmethod
+    def extract_terms(a):
+        terms = Counter({"tag:" + t.lower(): 3 for t in a.get("tags", [])})
+        for word in re.findall(r"[a-z0-9][a-z0-9/&-]+", (a["title"] + " " + a.get("excerpt", "")).lower()):
+            if word not in _STOPWORDS:
+                terms[word] += 1
+        return terms
+
+    def _vector(self, slug):
+        n = len(self.terms)
+        vec = {t: tf * math.log((1 + n) / (1 + self.df[t])) for t, tf in self.terms[slug].items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {t: w / norm for t, w in vec.items() if w > 0}
+
+    def _rank(self, slug):
+        scores = Counter()
+        for t, w in self.vectors[slug].items():
+            for other in self.postings.get(t, ()):
+                if other != slug:
+                    scores[other] += w * self.vectors[other].get(t, 0.0)
+        ranked = sorted((s for s in scores.items() if s[1] > 0), key=lambda s: (-s[1], s[0]))
+        return [other for other, _ in ranked[:self.k]]
+
+    def _index(self, slug, terms):
+        self.terms[slug] = terms
+        for t in terms:
+            self.df[t] += 1
+            self.postings.setdefault(t, set()).add(slug)
+
+    def _unindex(self, slug):
+        for t in self.terms.pop(slug, {}):
+            self.df[t] -= 1
+            self.postings[t].discard(slug)
+            if not self.df[t]:
+                del self.df[t], self.postings[t]
+
+    def rebuild(self, articles):
+        self.__init__(self.k)
+        for a in articles:
+            self._index(a["slug"], self.extract_terms(a))
+            self.digests[a["slug"]] = _content_digest(a)
+        self.vectors = {slug: self._vector(slug) for slug in self.terms}
+        self.neighbors = {slug: self._rank(slug) for slug in self.terms}
+
+    def update(self, article):
+        # Edit of an existing article: only documents sharing a term whose document
+        # frequency moved get new vectors, and only their neighbourhoods are re-ranked.
+        slug = article["slug"]
+        old, new = self.terms.get(slug, Counter()), self.extract_terms(article)
+        self._unindex(slug)
+        self._index(slug, new)
+        self.digests[slug] = _content_digest(article)
+        moved = set(old) ^ set(new)
+        revector = {slug}
+        for t in moved:
+            revector |= self.postings.get(t, set())
+        for other in revector:
+            self.vectors[other] = self._vector(other)
+        rerank = set(revector)
+        for other in revector:
+            for t in self.vectors[other]:
+                rerank |= self.postings.get(t, set())
+        rerank |= {o for o, ns in self.neighbors.items() if revector & set(ns)}
+        for other in rerank:
+            self.neighbors[other] = self._rank(other)
+        return rerank
+
+    def sync(self, articles):
+        # Returns the slugs whose neighbour lists may have changed
+        slugs = [a["slug"] for a in articles]
+        if set(slugs) != set(self.terms):
+            self.rebuild(articles)
+            return set(slugs)
+        touched = set()
+        for a in articles:
+            if self.digests.get(a["slug"]) != _content_digest(a):
+                touched |= self.update(a)
+        return touched
+
+    def related(self, slug):
+        return self.neighbors.get(slug, [])
+
+def _content_digest(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+# -------------------
+# Tenants: white-label sites selected by Host. The content above is the default site;
+# GOPARTNERR_TENANTS names a JSON registry of the others, shaped like
+#   {"acme": {"hosts": ["acme.example"], "brand": "ACME", "palette": {"accent": "#f60"},
+#             "description": "...", "contact": {"email": ..., "phone": ..., "location": ...},
+#             "stories_label": "Why ACME", "story": {"title": ..., "quote": ..., "summary": ...},
+#             "static_dir": "acme/static", "services": [...], "articles": [...]}}
+# Anything an entry leaves out comes from the default site, including static files
+# missing from its static_dir. Each tenant keeps its own asset manifest, CSS, page
+# cache and content versions; surrogate keys of non-default tenants are prefixed.
+# -------------------
+DEFAULT_TENANT = "default"
+TENANTS = {}         # name -> Tenant
+_TENANT_HOSTS = {}   # host -> Tenant
+
+class Tenant:
+    def __init__(self, name, entry, cache_dir, fallback=None):
+        self.name = name
+        self.hosts = [h.lower() for h in entry.get("hosts", [])]
+        self.base_url = entry.get("base_url") or (f"http://{self.hosts[0]}/" if self.hosts else BASE_URL)
+        self.brand = entry.get("brand", BRAND)
+        self.description = entry.get("description", DESCRIPTION)
+        self.contact = entry.get("contact", CONTACT)
+        self.stories_label = entry.get("stories_label", STORIES_LABEL)
+        self.story = entry.get("story", STORY)
+        self.palette = dict(DEFAULT_PALETTE, **entry.get("palette", {}))
+        self.static_dir = entry["static_dir"]
+        self.cache_dir = cache_dir
+        self.services = entry.get("services", SERVICES)
+        self.service_images = entry.get("service_images", SERVICE_IMAGES)
+        self.articles = entry.get("articles", ARTICLES)
+        self.ops_slides = entry.get("ops_slides", OPS_SLIDES)
+        self.fallback = fallback
+        self.service_by_slug = {}
+        self.article_by_slug = {}
+        self.related = RelatedIndex()
+        self.assets = {}
+        self.asset_names = {}    # lower-cased name -> manifest name
+        self.bad_refs = {}       # referenced name -> case-insensitive match or None
+        self.images = {}
+        self.logo_file = "logo.png"
+        self.video_file = None
+        self.css = None
+        self.content_versions = {}
+        self.api_cache = {}
+        self.pages = PageCache(os.path.join(cache_dir, "pages"), shared=SHARED_PAGE_CACHE,
+                               stale_while_revalidate=STALE_WHILE_REVALIDATE)
+
+    def load(self):
+        own = build_asset_manifest(self.static_dir, os.path.join(self.cache_dir, "asset-digests.json"))
+        images = build_image_index(own, os.path.join(self.cache_dir, "image-index.json"))
+        self.assets = dict(self.fallback.assets, **own) if self.fallback else own
+        self.images = dict(self.fallback.images, **images) if self.fallback else images
+        self.asset_names = {}
+        for name in sorted(self.assets, reverse=True):
+            self.asset_names[name.lower()] = name
+        self.bad_refs = {}
+        self.logo_file = pick_logo(self.assets)
+        self.video_file = pick_video(self.assets)
+        self.css = None
+
+    def surrogate_keys(self, keys):
+        return list(keys) if self.name == DEFAULT_TENANT else [f"{self.name}:{k}" for k in keys]
+
+def load_tenants(path):
+    # Registry entries; relative static_dir paths are relative to the registry file
+    with open(path, encoding="utf-8") as f:
+        registry = json.load(f)
+    root = os.path.dirname(os.path.abspath(path))
+    entries = {}
+    for name, entry in registry.items():
+        if name == DEFAULT_TENANT or not re.fullmatch(r"[a-z0-9][a-z0-9_-]*", name):
+            raise ValueError(f"invalid tenant name: {name!r}")
+        if not entry.get("hosts") or not entry.get("static_dir"):
+            raise ValueError(f"tenant {name!r} needs hosts and static_dir")
+        entries[name] = dict(entry, static_dir=os.path.join(root, entry["static_dir"]))
+    return entries
+
+def tenant():
+    default = TENANTS[DEFAULT_TENANT]
+    if not has_request_context():
+        return default
+    host = request.host.lower()
+    return _TENANT_HOSTS.get(host) or _TENANT_HOSTS.get(host.rsplit(":", 1)[0]) or default
+
 # -------------------
-TO_EMAIL = os.environ.get("GOPARTNERR_TO", "info@gopartnerr.com")
-SMTP_HOST = os.environ.get("GOPARTNERR_SMTP_HOST")
-SMTP_PORT = int(os.environ.get("GOPARTNERR_SMTP_PORT", "587"))
-SMTP_USER = os.environ.get("GOPARTNERR_SMTP_USER")
-SMTP_PASS = os.environ.get("GOPARTNERR_SMTP_PASS")
-
-def send_lead_email(name, email, message):
-    if not (SMTP_HOST and SMTP_USER and SMTP_PASS):
+# Leads. contact_post() only appends the lead to a durable outbox
+# (CACHE_DIR/lead-outbox.jsonl); a background dispatcher fans it out to each sink
+# in batches, flushing once LEAD_BATCH_SIZE leads are waiting or every
+# LEAD_FLUSH_INTERVAL seconds. Every sink keeps its own byte offset into the
+# outbox and its own circuit breaker, so a failing webhook doesn't hold up the CSV
+# or mail, and nothing is lost across restarts. Delivery is at-least-once; the
+# lead id lets a CRM drop repeats. Sinks: csv (always), smtp (when configured),
+# webhook (GOPARTNERR_LEAD_WEBHOOK). A lead a destination refuses outright (HTTP
+# 400/413/422, permanent SMTP reply to the message) is set aside in lead-outbox.rejected.jsonl rather than
+# retried forever. The outbox is emptied once every sink has caught up.
+# -------------------
+# Set by create_app() from default_config()
+TO_EMAIL = SMTP_HOST = SMTP_PORT = SMTP_USER = SMTP_PASS = SMTP_STARTTLS = None
+SMTP_CONNECT_TIMEOUT = SMTP_TIMEOUT = SMTP_BREAKER_THRESHOLD = SMTP_BREAKER_RESET = None
+LEAD_BATCH_SIZE = LEAD_FLUSH_INTERVAL = LEAD_WEBHOOK_URL = LEAD_WEBHOOK_TOKEN = LEAD_WEBHOOK_TIMEOUT = None
+LEAD_WEBHOOK_BREAKER_THRESHOLD = LEAD_WEBHOOK_BREAKER_RESET = None
+
+class CircuitBreaker:
+    # closed -> open after `threshold` consecutive failures; after `reset_after`
+    # seconds one caller is let through (half_open) to probe the dependency.
+    def __init__(self, name, threshold, reset_after):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = "half_open"
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.state, self.failures, self.last_error = "closed", 0, None
+
+    def failure(self, error):
+        with self.lock:
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state, self.opened_at = "open", time.monotonic()
+
+    def snapshot(self):
+        with self.lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = max(0.0, round(self.reset_after - (time.monotonic() - self.opened_at), 1))
+            return {"name": self.name, "state": self.state, "failures": self.failures, "trips": self.trips,
+                    "last_error": self.last_error, "retry_in": retry_in}
+
+def smtp_configured():
+    return bool(SMTP_HOST and SMTP_USER and SMTP_PASS)
+
+class PartialDelivery(Exception):
+    # Raised by a sink that delivered only the first `sent` leads of a batch
+    def __init__(self, sent, error):
+        super().__init__(f"{sent} delivered, then {type(error).__name__}: {error}")
+        self.sent = sent
+
+# A sink is any object with a `name` (its offset key), a `breaker` (CircuitBreaker
+# or None) gating retries, and send(leads), which delivers the whole batch or raises.
+class CsvSink:
+    name = "csv"
+    breaker = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def send(self, leads):
+        with self.lock, open(LEADS_CSV, "a", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            if f.tell() == 0: w.writerow(["Name", "Email", "Message", "Received", "Tenant"])
+            w.writerows([lead["name"], lead["email"], lead["message"], lead["received"],
+                         lead.get("tenant", DEFAULT_TENANT)] for lead in leads)
+
+class SmtpSink:
+    # One connection per batch
+    name = "smtp"
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+
+    def send(self, leads):
+        sent = 0
+        try:
+            with smtplib.SMTP(timeout=SMTP_CONNECT_TIMEOUT) as s:
+                s.connect(SMTP_HOST, SMTP_PORT)
+                s.sock.settimeout(SMTP_TIMEOUT)
+                if SMTP_STARTTLS: s.starttls()
+                s.login(SMTP_USER, SMTP_PASS)
+                for lead in leads:
+                    msg = EmailMessage()
+                    msg["Subject"] = f"New Lead — {lead.get('brand', BRAND)}"
+                    msg["From"] = SMTP_USER
+                    msg["To"] = TO_EMAIL
+                    msg.set_content(f"Name: {lead['name']}\nEmail: {lead['email']}\n\nMessage:\n{lead['message']}")
+                    s.send_message(msg)
+                    sent += 1
+        except Exception as e:
+            if sent:
+                raise PartialDelivery(sent, e) from e
+            raise
+
+class WebhookSink:
+    # POSTs {"leads": [...]} as JSON; any non-2xx response fails the batch
+    name = "webhook"
+
+    def __init__(self, url, token=None, breaker=None):
+        self.breaker = breaker
+        self.url = url
+        self.token = token
+
+    def send(self, leads):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        body = json.dumps({"leads": leads}, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers=headers, method="POST")
+        with urllib.request.urlopen(req, timeout=LEAD_WEBHOOK_TIMEOUT) as resp:
+            resp.read()
+
+def lead_sinks():
+    sinks = [CsvSink()]
+    if smtp_configured():
+        sinks.append(SmtpSink(CircuitBreaker("smtp", SMTP_BREAKER_THRESHOLD, SMTP_BREAKER_RESET)))
+    if LEAD_WEBHOOK_URL:
+        sinks.append(WebhookSink(LEAD_WEBHOOK_URL, LEAD_WEBHOOK_TOKEN,
+                                 CircuitBreaker("webhook", LEAD_WEBHOOK_BREAKER_THRESHOLD, LEAD_WEBHOOK_BREAKER_RESET)))
+    return sinks
+
+def lead_rejected(error):
+    # Refusals of the lead itself, which retrying won't fix: a permanent reply to the
+    # message data, HTTP 400/413/422. Bad credentials, a refused sender or recipient
+    # (always TO_EMAIL, never the lead's doing, and 4xx when greylisted) or a wrong URL
+    # (SMTP 530/535, HTTP 401/403/404/405) are outages like any other: the lead stays
+    # queued and the breaker counts the failure.
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in (400, 413, 422)
+    return isinstance(error, smtplib.SMTPDataError) and error.smtp_code >= 500
+
+class LeadOutbox:
+    def __init__(self, path, sinks):
+        self.path = path
+        self.offsets_path = os.path.splitext(path)[0] + ".offsets.json"
+        self.dead_path = os.path.splitext(path)[0] + ".rejected.jsonl"
+        self.sinks = sinks
+        self.wake = threading.Event()
+        self.queued = 0
+        self.flush_lock = threading.Lock()
+        self.delivered = Counter()
+        self.rejected = Counter()
+        self.flushes = 0
+
+    def append(self, lead):
+        line = json.dumps(lead, ensure_ascii=False) + "\n"
+        with file_lock(self.path + ".lock"), open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+        self.queued += 1
+        if self.queued >= LEAD_BATCH_SIZE:
+            self.wake.set()
+
+    def offsets(self):
+        try:
+            with open(self.offsets_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def read(self, offset, limit=None):
+        # [(lead or None if unreadable, offset after it)] for complete lines from `offset`
+        entries = []
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return entries
+        with f:
+            f.seek(offset)
+            while limit is None or len(entries) < limit:
+                raw = f.readline()
+                if not raw.endswith(b"\n"):
+                    break
+                offset += len(raw)
+                try:
+                    entries.append((json.loads(raw), offset))
+                except ValueError:
+                    print(f"[leads] skipping unreadable outbox line ending at byte {offset}", file=sys.stderr)
+                    entries.append((None, offset))
+        return entries
+
+    def flush(self):
+        # One dispatcher at a time across threads and worker processes; the others skip
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.flush_lock, open(self.path + ".dispatch", "a") as lock:
+            if fcntl:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return
+            self.flushes += 1
+            offsets = self.offsets()
+            for sink in self.sinks:
+                offset = self.drain(sink, offsets.get(sink.name, 0))
+                if offset != offsets.get(sink.name, 0):    # idle flushes don't rewrite the file
+                    offsets[sink.name] = offset
+                    write_atomic(self.offsets_path, json.dumps(offsets).encode("utf-8"))
+            self.compact(offsets)
+
+    def drain(self, sink, offset):
+        limit = LEAD_BATCH_SIZE
+        while True:
+            entries = self.read(offset, limit)
+            if not entries or (sink.breaker and not sink.breaker.allow()):
+                return offset
+            mine = [(lead, end) for lead, end in entries if lead]
+            try:
+                if mine:
+                    sink.send([lead for lead, _ in mine])
+                sent, error = len(mine), None
+            except PartialDelivery as e:
+                sent, error = min(e.sent, len(mine)), e.__cause__ or e
+            except Exception as e:
+                sent, error = 0, e
+            self.delivered[sink.name] += sent
+            if sent == len(mine):    # e.g. QUIT failing after every message went out
+                if sink.breaker:
+                    sink.breaker.success()
+                offset = entries[-1][1]
+                continue
+            # Resume at the first undelivered lead (entries skipped before it are done)
+            failed = next(i for i, (_, end) in enumerate(entries) if end == mine[sent][1])
+            offset = entries[failed - 1][1] if failed else offset
+            if lead_rejected(error):
+                if sink.breaker:
+                    sink.breaker.success()    # the destination is up, it refused the lead
+                if sent or len(mine) == 1:
+                    self.dead_letter(sink, mine[sent][0], error)
+                    offset = mine[sent][1]
+                else:
+                    limit = 1    # a batch was refused: send one at a time to find the culprit
+                continue
+            print(f"[leads] {sink.name} failed after {sent}/{len(mine)}: {error}", file=sys.stderr)
+            if sink.breaker:
+                if sent:
+                    sink.breaker.success()
+                sink.breaker.failure(error)
+            return offset
+
+    def dead_letter(self, sink, lead, error):
+        print(f"[leads] {sink.name} rejected lead {lead.get('id')}: {error}; moved to {self.dead_path}", file=sys.stderr)
+        self.rejected[sink.name] += 1
+        line = json.dumps({"sink": sink.name, "error": f"{type(error).__name__}: {error}", "lead": lead}, ensure_ascii=False)
+        with open(self.dead_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def compact(self, offsets):
+        # Offsets are reset before the file is emptied: a crash in between re-sends, never skips
+        with file_lock(self.path + ".lock"):
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return
+            if not size or any(offsets.get(sink.name, 0) < size for sink in self.sinks):
+                return
+            write_atomic(self.offsets_path, b"{}")
+            with open(self.path, "wb"):
+                pass
+
+    def pending(self, sink):
+        return sum(1 for lead, _ in self.read(self.offsets().get(sink.name, 0)) if lead)
+
+    def snapshot(self):
+        sinks = {}
+        for sink in self.sinks:
+            sinks[sink.name] = {"pending": self.pending(sink), "delivered": self.delivered[sink.name],
+                                "rejected": self.rejected[sink.name]}
+            if sink.breaker:
+                sinks[sink.name]["breaker"] = sink.breaker.snapshot()
+        return {"flushes": self.flushes, "sinks": sinks}
+
+    def run(self):
+        while True:
+            self.wake.wait(LEAD_FLUSH_INTERVAL)
+            self.wake.clear()
+            self.queued = 0
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[leads] dispatch failed: {e}", file=sys.stderr)
+
+LEADS = None    # LeadOutbox, set by configure()
+LEADS_CSV = None
+
+# -------------------
+# Lead export (admin). Reads leads.csv incrementally; cursors are byte offsets.
+# -------------------
+ADMIN_TOKEN = None
+
+def admin_authorized():
+    if not ADMIN_TOKEN:
         return False
+    supplied = request.headers.get("Authorization", "")
+    return hmac.compare_digest(supplied.encode(), f"Bearer {ADMIN_TOKEN}".encode())
+
+def admin_denied():
+    if not ADMIN_TOKEN:
+        return Response("Not found", status=404, mimetype="text/plain")
+    return Response("Unauthorized", status=401, mimetype="text/plain",
+                    headers={"WWW-Authenticate": 'Bearer realm="admin"'})
+
+def leads_size():
+    try:
+        return os.path.getsize(LEADS_CSV)
+    except OSError:
+        return 0
+
+def iter_leads(start=0, end=None):
+    # Yields (lead, next_offset). Rows written before the "Received" column existed have received=None,
+    # rows written before the "Tenant" column existed belong to the default tenant.
+    if end is None:
+        end = leads_size()
     try:
-        msg = EmailMessage()
-        msg["Subject"] = f"New Lead — {BRAND}"
-        msg["From"] = SMTP_USER
-        msg["To"] = TO_EMAIL
-        msg.set_content(f"Name: {name}\nEmail: {email}\n\nMessage:\n{message}")
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as s:
-            s.starttls(); s.login(SMTP_USER, SMTP_PASS); s.send_message(msg)
+        f = open(LEADS_CSV, "rb")
+    except OSError:
+        return
+    with f:
+        header = f.readline(end)
+        pos = max(start, len(header))
+        if not header.endswith(b"\n") or pos >= end:
+            return
+        f.seek(pos)
+        state = {"pos": pos, "complete": True}
+
+        def lines():
+            while state["pos"] < end:
+                raw = f.readline(end - state["pos"])
+                if not raw:
+                    return
+                state["pos"] += len(raw)
+                state["complete"] = raw.endswith(b"\n")
+                yield raw.decode("utf-8", "replace")
+
+        for row in csv.reader(lines()):
+            if not state["complete"]:
+                return
+            if len(row) < 3:
+                continue
+            yield {
+                "name": row[0], "email": row[1], "message": row[2],
+                "received": row[3] if len(row) > 3 and row[3] else None,
+                "tenant": row[4] if len(row) > 4 and row[4] else DEFAULT_TENANT,
+            }, state["pos"]
+
+def _parse_when(value, end_of_day=False):
+    value = value.strip()
+    if len(value) == 10:
+        day = datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        return day + timedelta(days=1) if end_of_day else day
+    when = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+def lead_filter(since=None, until=None, email=None, tenant=None):
+    email = (email or "").strip().lower()
+
+    def keep(lead):
+        if tenant and lead["tenant"] != tenant:
+            return False
+        if email and email not in (lead["email"] or "").lower():
+            return False
+        if since or until:
+            if not lead["received"]:
+                return False
+            try:
+                when = _parse_when(lead["received"])
+            except (TypeError, ValueError):    # hand-edited or corrupt row: never in range
+                return False
+            if since and when < since: return False
+            if until and when >= until: return False
         return True
-    except Exception:
-        return False
-
-def save_lead_csv(name, email, message):
-    path = "leads.csv"; new = not os.path.exists(path)
-    with open(path, "a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        if new: w.writerow(["Name", "Email", "Message"])
-        w.writerow([name, email, message])
+    return keep
 
 # -------------------
 # HTML helpers
 # -------------------
 def head(title, description=""):
-    # Sora for bold headlines, Manrope for body
+    # Sora for bold headlines, Manrope for body. The stylesheet is compiled once per
+    # tenant (palette + asset URLs) and reused by every page.
+    site = tenant()
+    if site.css is None:
+        site.css = compile_css(site)
     fonts = f"""
 <link rel="preconnect" href="https://fonts.googleapis.com">
 <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
@@ -408,14 +1291,21 @@ def head(title, description=""):
 <meta charset="utf-8"/><meta name="viewport" content="width=device-width,initial-scale=1"/>
 <title>{title}</title><meta name="description" content="{description}"/>
 {fonts}
-<style>
+{site.css}</head>"""
+
+def compile_css(site):
+    p = site.palette
+    hero = pick_asset(site, "hero.jpg")
+    hero_bg = f"url('{static_url(hero)}') center/cover no-repeat" if hero else "none"
+    return f"""<style>
 :root {{
-  --bg:{BG}; --surface:{SURFACE}; --text:{TEXT}; --muted:{MUTED};
-  --accent:{ACCENT}; --accent2:{ACCENT_2}; --border:{BORDER}; --shadow:{SHADOW};
+  --bg:{p['bg']}; --surface:{p['surface']}; --text:{p['text']}; --muted:{p['muted']};
+  --accent:{p['accent']}; --accent2:{p['accent2']}; --border:{p['border']}; --shadow:{p['shadow']};
   --r:18px; --container:1100px;
 }}
 * {{ box-sizing:border-box }}
 html {{ scroll-behavior:smooth }}
+img {{ height:auto }}
 body {{
   margin:0; color:var(--text);
   font-family: Manrope, ui-sans-serif, -apple-system, "Segoe UI", Roboto, Arial, "Noto Sans", sans-serif;
@@ -483,7 +1373,7 @@ header.top {{
 }}
 .hero::before {{
   content:""; position:absolute; inset:0; z-index:1;
-  background:url('{url_for('static', filename='hero.jpg')}') center/cover no-repeat;
+  background:{hero_bg};
   opacity:.12;
 }}
 .hero.has-video::before {{ background:none }}
@@ -644,6 +1534,11 @@ blockquote {{ margin:0; font-size:18px; color:#0c1526 }}
 .article-body figure {{ margin:14px 0 }}
 .article-body figcaption {{ font-size:13px; color:var(--muted); margin-top:6px }}
 .share-row {{ display:flex; gap:10px; flex-wrap:wrap }}
+.related {{ margin-top:28px }}
+.related-grid {{ display:grid; gap:14px; grid-template-columns:repeat(3,1fr) }}
+@media (max-width:900px) {{ .related-grid {{ grid-template-columns:1fr }} }}
+.related-card h3 {{ font-size:18px }}
+.related-card .meta {{ font-size:13px; color:var(--muted) }}
 .share-row .btn {{ font-size:14px; padding:10px 14px }}
 
 /* Contact */
@@ -673,38 +1568,55 @@ footer {{ padding:38px 0 60px; color:var(--muted); border-top:1px solid var(--bo
   border:1px solid var(--border); background:rgba(255,255,255,.98); color:var(--text); display:none
 }}
 #topBtn.show {{ display:inline-flex }}
-</style></head>"""
+</style>"""
+
+def logo_img(site):
+    logo = pick_asset(site, site.logo_file)
+    return f'<img src="{static_url(logo)}" alt="{site.brand} Logo">' if logo else ""
+
+# Partial navigation: header_nav() opens <main id="main"> and footer_block() closes
+# it, so every page's own content sits in one element. A GET with "X-Fragment: main"
+# gets just that element's contents (sliced from the cached page, with its own
+# ETag; title and description in headers). With GOPARTNERR_PARTIAL_NAV=1 the page
+# script fetches that for internal links and swaps it in instead of loading the
+# whole document. Speculation rules are left out then: intercepted links never use
+# a prefetched document.
+PARTIAL_NAV = None    # set by create_app()
 
 def header_nav():
+    site = tenant()
     return f"""
 <body>
 <header class="top">
   <div class="container nav">
     <div class="brand">
-      <img src="{url_for('static', filename=LOGO_FILE)}" alt="{BRAND} Logo">
-      <span>{BRAND}</span>
+      {logo_img(site)}
+      <span>{site.brand}</span>
     </div>
     <nav class="menu" aria-label="Main navigation">
       <a href="/#services">Services</a>
       <a href="/#platform">Operations</a>
-      <a href="/#stories">Why GoPartnerr</a>
+      <a href="/#stories">{site.stories_label}</a>
       <a href="/articles">Articles</a>
       <a class="btn" href="/#contact">Talk to sales</a>
     </nav>
   </div>
 </header>
+<main id="main" tabindex="-1">
 """
 
 def footer_block():
+    site = tenant()
     html = f"""
+</main>
 <footer>
   <div class="container footer-grid">
     <div>
       <div class="brand" style="margin-bottom:8px">
-        <img src="{url_for('static', filename=LOGO_FILE)}" alt="{BRAND} Logo">
-        <span>{BRAND}</span>
+        {logo_img(site)}
+        <span>{site.brand}</span>
       </div>
-      <div>© <span id="year"></span> {BRAND}. All rights reserved.</div>
+      <div>© <span id="year"></span> {site.brand}. All rights reserved.</div>
     </div>
     <div>
       <strong>Explore</strong><br>
@@ -732,78 +1644,201 @@ def footer_block():
 <script>
 document.addEventListener('DOMContentLoaded', function () {
   document.getElementById('year').textContent = new Date().getFullYear();
+  // Remember the last service/article read so a later /contact post can be attributed to it
+  let src = location.pathname;
+  function trackSource() {
+    src = location.pathname;
+    try {
+      if (/^\\/(services|articles)\\/./.test(location.pathname)) sessionStorage.setItem('gp_src', location.pathname);
+      src = sessionStorage.getItem('gp_src') || src;
+    } catch (e) {}
+  }
+
+  // Contact forms post via fetch when available: the home form swaps in the
+  // re-rendered contact fragment, other forms show the JSON status inline.
+  function contactNotice(form, ok, message) {
+    let note = form.parentNode.querySelector('.contact-notice');
+    if (!note) {
+      note = document.createElement('p');
+      note.className = 'contact-notice lead';
+      note.style.cssText = 'font-size:16px;margin-top:12px';
+      form.after(note);
+    }
+    note.textContent = (ok ? '✅ ' : '❌ ') + message;
+  }
+  function bindContactForms(root) {
+    root.querySelectorAll('form.contact').forEach(form => {
+      const source = form.querySelector('input[name=source]');
+      if (source) source.value = src;
+      if (!window.fetch || !window.FormData) return;
+      form.addEventListener('submit', async e => {
+        e.preventDefault();
+        const btn = form.querySelector('button[type=submit]');
+        if (btn) btn.disabled = true;
+        const section = form.closest('#contact');
+        try {
+          const res = await fetch(form.action, {
+            method: 'POST', body: new FormData(form), credentials: 'same-origin',
+            headers: section ? {'X-Fragment': 'contact'} : {'Accept': 'application/json'}
+          });
+          if (res.status === 503) {
+            contactNotice(form, false, 'We’re busy right now. Please try again in a moment.');
+          } else if (section) {
+            const tpl = document.createElement('template');
+            tpl.innerHTML = await res.text();
+            document.querySelectorAll('.contact-notice').forEach(n => n.remove());
+            bindContactForms(tpl.content);
+            section.replaceWith(tpl.content);
+          } else {
+            const data = await res.json();
+            contactNotice(form, data.ok, data.message);
+            if (data.ok) form.reset();
+          }
+        } catch (err) {
+          form.submit();
+        } finally {
+          if (btn) btn.disabled = false;
+        }
+      });
+    });
+  }
   const topBtn = document.getElementById('topBtn');
   document.addEventListener('scroll', function () {
     if (window.scrollY > 400) topBtn.classList.add('show'); else topBtn.classList.remove('show');
   });
 
-  const hv = document.querySelector('.hero-video');
-  if (hv) {
-    try { hv.muted = true; } catch(e){}
-    try { hv.setAttribute('muted',''); hv.setAttribute('playsinline',''); hv.setAttribute('webkit-playsinline',''); } catch(e){}
-    const p = hv.play && hv.play();
-    if (p && p.catch) { p.catch(()=>{}); }
-  }
-
-  const stage = document.querySelector('.ops-stage');
-  const slides = stage ? Array.from(stage.querySelectorAll('.ops-slide')) : [];
-  const dots   = Array.from(document.querySelectorAll('.ops-dot'));
-  const left   = document.querySelector('.ops-arrow.left');
-  const right  = document.querySelector('.ops-arrow.right');
-  const INTERVAL = 15000;
-
-  if (!stage || !slides.length) return;
-
-  let index = 0, timer = null;
-
-  function setHeight() {
-    const h = Math.max(...slides.map(s => { s.style.position = 'static'; return s.offsetHeight; }));
-    slides.forEach(s => s.style.position = 'absolute');
-    stage.style.height = h + 'px';
-  }
-
-  function go(i) {
-    index = (i + slides.length) % slides.length;
-    slides.forEach((s, k) => s.classList.toggle('active', k === index));
-    dots.forEach((d, k) => d.setAttribute('aria-current', k === index ? 'true' : 'false'));
+  // Everything tied to the page content; runs again after a partial navigation,
+  // aborting the previous page's listeners and carousel timer first.
+  let pageScope = null;
+  function initMain(root) {
+    if (pageScope) pageScope.abort();
+    pageScope = window.AbortController ? new AbortController() : null;
+    const signal = pageScope ? pageScope.signal : undefined;
+    trackSource();
+    bindContactForms(root);
+
+    const hv = root.querySelector('.hero-video');
+    if (hv) {
+      try { hv.muted = true; } catch(e){}
+      try { hv.setAttribute('muted',''); hv.setAttribute('playsinline',''); hv.setAttribute('webkit-playsinline',''); } catch(e){}
+      const p = hv.play && hv.play();
+      if (p && p.catch) { p.catch(()=>{}); }
+    }
+
+    const stage = root.querySelector('.ops-stage');
+    const slides = stage ? Array.from(stage.querySelectorAll('.ops-slide')) : [];
+    const dots   = Array.from(root.querySelectorAll('.ops-dot'));
+    const left   = root.querySelector('.ops-arrow.left');
+    const right  = root.querySelector('.ops-arrow.right');
+    const INTERVAL = 15000;
+
+    if (!stage || !slides.length) return;
+
+    let index = 0, timer = null;
+    if (signal) signal.addEventListener('abort', () => { if (timer) clearInterval(timer); });
+
+    function setHeight() {
+      const h = Math.max(...slides.map(s => { s.style.position = 'static'; return s.offsetHeight; }));
+      slides.forEach(s => s.style.position = 'absolute');
+      stage.style.height = h + 'px';
+    }
+
+    function go(i) {
+      index = (i + slides.length) % slides.length;
+      slides.forEach((s, k) => s.classList.toggle('active', k === index));
+      dots.forEach((d, k) => d.setAttribute('aria-current', k === index ? 'true' : 'false'));
+      resetTimer();
+    }
+
+    function resetTimer() {
+      if (timer) clearInterval(timer);
+      timer = setInterval(() => go(index + 1), INTERVAL);
+    }
+
+    slides.forEach(s => s.classList.remove('active'));
+    slides[0].classList.add('active');
+    dots.forEach((d, k) => d.addEventListener('click', () => go(k)));
+    if (left)  left.addEventListener('click', () => go(index - 1));
+    if (right) right.addEventListener('click', () => go(index + 1));
+    document.addEventListener('keydown', e => { if (e.key === 'ArrowLeft') go(index - 1); if (e.key === 'ArrowRight') go(index + 1); }, {signal});
+
+    stage.addEventListener('mouseenter', () => { if (timer) clearInterval(timer); });
+    stage.addEventListener('mouseleave', resetTimer);
+
+    document.addEventListener('visibilitychange', () => { if (document.hidden) { if (timer) clearInterval(timer); } else { resetTimer(); } }, {signal});
+
+    setHeight();
+    window.addEventListener('resize', setHeight, {signal});
     resetTimer();
   }
 
-  function resetTimer() {
-    if (timer) clearInterval(timer);
-    timer = setInterval(() => go(index + 1), INTERVAL);
+  // Partial navigation: internal page links fetch only <main>'s content and swap it
+  // in; anything unexpected falls back to a normal page load.
+  const main = document.getElementById('main');
+  const PAGE_PATH = new RegExp('^/(?:(?:services|articles)/[^/]+|articles)?$');
+  let shown = location.pathname + location.search;
+  async function navigate(url, push) {
+    try {
+      const res = await fetch(url.pathname + url.search, {headers: {'X-Fragment': 'main'}, credentials: 'same-origin'});
+      if (!res.ok || res.headers.get('X-Fragment') !== 'main') throw new Error('no fragment');
+      main.innerHTML = await res.text();
+      document.title = decodeURIComponent(res.headers.get('X-Page-Title') || '');
+      const meta = document.querySelector('meta[name=description]');
+      if (meta) meta.setAttribute('content', decodeURIComponent(res.headers.get('X-Page-Description') || ''));
+      if (push) history.pushState(null, '', url.href);
+      shown = url.pathname + url.search;
+      main.querySelectorAll('script').forEach(old => {    // inserted scripts don't run by themselves
+        const s = document.createElement('script');
+        for (const attr of old.attributes) s.setAttribute(attr.name, attr.value);
+        s.text = old.text;
+        old.replaceWith(s);
+      });
+      initMain(main);
+      const target = url.hash && document.getElementById(decodeURIComponent(url.hash.slice(1)));
+      if (target) target.scrollIntoView(); else if (push) window.scrollTo(0, 0);
+      main.focus({preventScroll: true});
+    } catch (err) {
+      if (push) location.assign(url.href); else location.reload();
+    }
   }
-
-  slides.forEach(s => s.classList.remove('active'));
-  slides[0].classList.add('active');
-  dots.forEach((d, k) => d.addEventListener('click', () => go(k)));
-  if (left)  left.addEventListener('click', () => go(index - 1));
-  if (right) right.addEventListener('click', () => go(index + 1));
-  document.addEventListener('keydown', e => { if (e.key === 'ArrowLeft') go(index - 1); if (e.key === 'ArrowRight') go(index + 1); });
-
-  stage.addEventListener('mouseenter', () => { if (timer) clearInterval(timer); });
-  stage.addEventListener('mouseleave', resetTimer);
-
-  document.addEventListener('visibilitychange', () => { if (document.hidden) { if (timer) clearInterval(timer); } else { resetTimer(); } });
-
-  setHeight();
-  window.addEventListener('resize', setHeight);
-  resetTimer();
+  if (__PARTIAL_NAV__ && main && window.fetch && window.AbortController && history.pushState) {
+    document.addEventListener('click', e => {
+      const a = e.target.closest && e.target.closest('a[href]');
+      if (!a || e.defaultPrevented || e.button !== 0 || e.metaKey || e.ctrlKey || e.shiftKey || e.altKey) return;
+      if ((a.target && a.target !== '_self') || a.hasAttribute('download')) return;
+      const url = new URL(a.href, location.href);
+      if (url.origin !== location.origin || !PAGE_PATH.test(url.pathname)) return;
+      if (url.pathname + url.search === shown) return;    // same page: let #hash links scroll
+      e.preventDefault();
+      navigate(url, true);
+    });
+    window.addEventListener('popstate', () => {
+      const url = new URL(location.href);
+      if (url.pathname + url.search !== shown) navigate(url, false);
+    });
+  }
+  initMain(document);
 });
+if ('serviceWorker' in navigator) {
+  window.addEventListener('load', () => navigator.serviceWorker.register('/sw.js').catch(() => {}));
+}
 </script>
 </body></html>
 """
-    return html + script
+    return html + script.replace("__PARTIAL_NAV__", "true" if PARTIAL_NAV else "false")
 
 def hero_section():
-    has_video = bool(VIDEO_FILE)
+    site = tenant()
+    video_file = site.video_file
+    has_video = bool(video_file)
     video_html = ""
     if has_video:
+        poster = pick_asset(site, "hero.jpg")
+        poster_attr = f' poster="{static_url(poster)}"' if poster else ""
         video_html = f"""
     <div class="hero-bg" aria-hidden="true">
-      <video class="hero-video" autoplay muted loop playsinline webkit-playsinline preload="auto"
-             poster="{url_for('static', filename='hero.jpg')}">
-        <source src="{url_for('static', filename=VIDEO_FILE)}" type="{_video_mime(VIDEO_FILE)}">
+      <video class="hero-video" autoplay muted loop playsinline webkit-playsinline preload="auto"{poster_attr}>
+        <source src="{static_url(video_file)}" type="{_video_mime(video_file)}">
       </video>
     </div>
     """
@@ -824,49 +1859,51 @@ def hero_section():
 # -------------------
 # Operations (Carousel) — 3 slides with your images
 # -------------------
-def platform_band():
-    slides = [
-        {
-            "title": "Our Promise to Clients",
-            "lead": "Choice, orchestration, insight, and speed — all working as one system.",
-            "bullets": [
-                "Multiple best-fit proposals, not just one — leveraging our partner ecosystem for choice, transparency, and competitive advantage.",
-                "Seamless orchestration of sales strategy, planning, capability building, and operational support — from prospect to cash, without friction.",
-                "Actionable insights and analytics that turn data into strategic advantage, enabling faster, better decisions.",
-                "Scalable, automated processes that reduce complexity, increase agility, and ensure world-class responsiveness."
-            ],
-            "img": "ops2.jpg",
-            "alt": "Our Promise to Clients"
-        },
-        {
-            "title": "Operational Excellence at Scale",
-            "lead": "A global operating framework that’s consistent and agile.",
-            "bullets": [
-                "Consistency across the IT domain — unified processes, tools, and governance deliver a premium experience anywhere in the world.",
-                "Agility in execution — rapid mobilization for new opportunities without compromising quality or compliance.",
-                "Sustainable cost efficiency — high-value capabilities are prioritized while transactional activities are optimized through automation and shared services."
-            ],
-            "img": "ops3.jpg",
-            "alt": "Operational Excellence at Scale"
-        },
-        {
-            "title": "Built for the Modern Sales Environment",
-            "lead": "Digitization has redefined how sales teams engage with customers. We enable you to meet that challenge.",
-            "bullets": [
-                "Real-time customer insights",
-                "Integrated partner collaboration",
-                "Strategic proposal management",
-                "Post-sale service excellence"
-            ],
-            "footer": "The result: higher win rates, shorter sales cycles, stronger customer loyalty, and measurable ROI.",
-            "img": "ops4.jpg",
-            "alt": "Built for the Modern Sales Environment"
-        }
-    ]
+OPS_SLIDES = [
+    {
+        "title": "Our Promise to Clients",
+        "lead": "Choice, orchestration, insight, and speed — all working as one system.",
+        "bullets": [
+            "Multiple best-fit proposals, not just one — leveraging our partner ecosystem for choice, transparency, and competitive advantage.",
+            "Seamless orchestration of sales strategy, planning, capability building, and operational support — from prospect to cash, without friction.",
+            "Actionable insights and analytics that turn data into strategic advantage, enabling faster, better decisions.",
+            "Scalable, automated processes that reduce complexity, increase agility, and ensure world-class responsiveness."
+        ],
+        "img": "ops2.jpg",
+        "alt": "Our Promise to Clients"
+    },
+    {
+        "title": "Operational Excellence at Scale",
+        "lead": "A global operating framework that’s consistent and agile.",
+        "bullets": [
+            "Consistency across the IT domain — unified processes, tools, and governance deliver a premium experience anywhere in the world.",
+            "Agility in execution — rapid mobilization for new opportunities without compromising quality or compliance.",
+            "Sustainable cost efficiency — high-value capabilities are prioritized while transactional activities are optimized through automation and shared services."
+        ],
+        "img": "ops3.jpg",
+        "alt": "Operational Excellence at Scale"
+    },
+    {
+        "title": "Built for the Modern Sales Environment",
+        "lead": "Digitization has redefined how sales teams engage with customers. We enable you to meet that challenge.",
+        "bullets": [
+            "Real-time customer insights",
+            "Integrated partner collaboration",
+            "Strategic proposal management",
+            "Post-sale service excellence"
+        ],
+        "footer": "The result: higher win rates, shorter sales cycles, stronger customer loyalty, and measurable ROI.",
+        "img": "ops4.jpg",
+        "alt": "Built for the Modern Sales Environment"
+    }
+]
 
+def platform_band():
     def li(items):
         return "".join(f"<li>{x}</li>" for x in items)
 
+    site = tenant()
+    slides = site.ops_slides
     slides_html = ""
     for s in slides:
         text_block = f"""
@@ -882,6 +1919,9 @@ def platform_band():
         if "footer" in s:
             text_block += f"<p class='lead' style='margin-top:10px'>{s['footer']}</p>"
 
+        img = pick_asset(site, s["img"])
+        visual = f"""<img src="{static_url(img)}" alt="{s['alt']}" loading="lazy"{img_attrs(img)}
+               style="{img_placeholder(img)}width:100%;height:100%;object-fit:cover;border-radius:12px;border:1px solid var(--border)">""" if img else ""
         slides_html += f"""
       <div class="ops-slide" role="group" aria-roledescription="slide" aria-label="{s['title']}">
         <div class="glass" style="padding:22px">
@@ -892,8 +1932,7 @@ def platform_band():
           </div>
         </div>
         <div class="ops-visual">
-          <img src="{url_for('static', filename=s['img'])}" alt="{s['alt']}" loading="lazy"
-               style="width:100%;height:100%;object-fit:cover;border-radius:12px;border:1px solid var(--border)">
+          {visual}
         </div>
       </div>
         """
@@ -918,18 +1957,20 @@ def platform_band():
 """
 
 def services_grid():
+    site = tenant()
     def service_card(s):
-        img_file = SERVICE_IMAGES.get(s["slug"], "symbol.png")
+        img_file = service_image(site, s["slug"])
+        img = f"""<img src="{static_url(img_file)}" alt="{s['title']}" loading="lazy"{img_attrs(img_file)} style="{img_placeholder(img_file)}">""" if img_file else ""
         chips = "".join(f'<span class="chip">{b.split("&")[0].strip()}</span>' for b in s.get("bullets", [])[:3])
         return f"""
         <a class="card" href="/services/{s['slug']}">
-          <img src="{url_for('static', filename=img_file)}" alt="{s['title']}" loading="lazy">
+          {img}
           <h3>{s['title']}</h3>
           <p>{s['summary']}</p>
           <div class="chips">{chips}</div>
         </a>
         """
-    cards = "".join(service_card(s) for s in SERVICES)
+    cards = "".join(service_card(s) for s in site.services)
     return f"""
 <section id="services" class="services">
   <div class="container">
@@ -940,30 +1981,46 @@ def services_grid():
 </section>
 """
 
+# -------------------
+# Customer story on the home page
+# -------------------
+STORY = {
+    "title": "GoPartnerr empowers Vertasse, a leading vertical transportation consultancy, to bridge the information gap between contractors, developers, and manufacturers",
+    "quote": """Through advanced AI, Vertasse’s clients and partners can now read, interpret, refine, and deliver proposals with unmatched accuracy and speed.
+
+This solution creates a single source of truth—a one-stop platform where stakeholders gain full clarity on requirements and ensure that even the most complex specifications are never overlooked.
+""",
+    "summary": "We enable Veretasse to sell smarter and excecute with precision.",
+}
+
 def stories_teaser():
+    site = tenant()
+    story = site.story
+    case = pick_asset(site, "case.jpg")
+    visual = f"""<img src="{static_url(case)}" alt="Customer story (placeholder)" loading="lazy"{img_attrs(case)} style="{img_placeholder(case)}width:100%;border-radius:12px;border:1px solid var(--border)">""" if case else ""
     return f"""
 <section id="stories" class="stories">
   <div class="container story">
     <div class="glass" style="padding:18px">
-      <h3 style="margin:0 0 8px">GoPartnerr empowers Vertasse, a leading vertical transportation consultancy, to bridge the information gap between contractors, developers, and manufacturers</h3>
-      <blockquote>Through advanced AI, Vertasse’s clients and partners can now read, interpret, refine, and deliver proposals with unmatched accuracy and speed.
-
-This solution creates a single source of truth—a one-stop platform where stakeholders gain full clarity on requirements and ensure that even the most complex specifications are never overlooked.
-</blockquote>
-      <p class="lead" style="margin-top:8px">We enable Veretasse to sell smarter and excecute with precision.</p>
+      <h3 style="margin:0 0 8px">{story["title"]}</h3>
+      <blockquote>{story["quote"]}</blockquote>
+      <p class="lead" style="margin-top:8px">{story["summary"]}</p>
       <div class="cta"><a class="btn ghost" href="#contact">Talk to an expert</a></div>
     </div>
-    <div><img src="{url_for('static', filename='case.jpg')}" alt="Customer story (placeholder)" loading="lazy" style="width:100%;border-radius:12px;border:1px solid var(--border)"></div>
+    <div>{visual}</div>
   </div>
 </section>
 """
 
 def contact_band(success_msg="", error_msg=""):
+    contact = tenant().contact
+    details = [f"Email: {contact['email']}" if contact.get("email") else "",
+               f"Phone: {contact['phone']}" if contact.get("phone") else "", contact.get("location", "")]
     notices = ""
     if success_msg:
-        notices += f'<div class="container" style="margin-top:12px"><div class="glass" style="padding:12px">✅ {success_msg}</div></div>'
+        notices += f'<div class="container contact-notice" style="margin-top:12px"><div class="glass" style="padding:12px">✅ {success_msg}</div></div>'
     if error_msg:
-        notices += f'<div class="container" style="margin-top:12px"><div class="glass" style="padding:12px">❌ {error_msg}</div></div>'
+        notices += f'<div class="container contact-notice" style="margin-top:12px"><div class="glass" style="padding:12px">❌ {error_msg}</div></div>'
     return f"""
 <section id="contact" class="cta-band">
   <div class="container" style="display:grid;gap:22px;grid-template-columns:1.1fr .9fr">
@@ -976,13 +2033,14 @@ def contact_band(success_msg="", error_msg=""):
       <form class="contact" method="post" action="/contact">
         <input type="text" name="name" placeholder="Your name" required>
         <input type="email" name="email" placeholder="Work email" required>
+        <input type="hidden" name="source" value="">
         <textarea name="message" placeholder="What are you trying to improve?" required></textarea>
         <div class="actions">
           <button class="btn primary" type="submit">Send message</button>
         </div>
       </form>
       <p class="lead" style="font-size:16px;margin-top:12px">
-        Email: info@gopartnerr.com • Phone: 585588202 • Abu Dhabi, UAE
+        {" • ".join(d for d in details if d)}
       </p>
     </div>
   </div>
@@ -991,30 +2049,73 @@ def contact_band(success_msg="", error_msg=""):
 """
 
 def home_html(success_msg="", error_msg=""):
+    site = tenant()
     return (
-        head(f"{BRAND} — IT & Digital Transformation",
-             "GoPartnerr: Security, data, applications, and infrastructure done right.")
+        head(f"{site.brand} — IT & Digital Transformation", site.description)
         + header_nav()
         + hero_section()
         + platform_band()
         + services_grid()
         + stories_teaser()
         + contact_band(success_msg, error_msg)
+        + speculation_rules([f"/services/{s['slug']}" for s in site.services])
         + footer_block()
     )
 
+# Speculation Rules for the likely next navigations (service cards on /, article
+# cards on /articles, related reading on an article). Browsers without support get
+# <link rel=prefetch> on the same trigger the eagerness implies.
+SPECULATION_EAGERNESS = SPECULATION_ACTION = SPECULATION_MAX = None    # set by create_app()
+SPECULATION_TRIGGERS = {"immediate": None, "eager": None, "moderate": "pointerover", "conservative": "pointerdown"}
+
+def speculation_rules(urls):
+    urls = list(dict.fromkeys(urls))[:SPECULATION_MAX]
+    if PARTIAL_NAV or not urls or SPECULATION_EAGERNESS not in SPECULATION_TRIGGERS:
+        return ""
+    rules = json.dumps({SPECULATION_ACTION: [{"source": "list", "urls": urls, "eagerness": SPECULATION_EAGERNESS}]})
+    rules, url_list = rules.replace("</", "<\\/"), json.dumps(urls).replace("</", "<\\/")
+    trigger = SPECULATION_TRIGGERS[SPECULATION_EAGERNESS]
+    if trigger:
+        start = f"""document.addEventListener('{trigger}', e => {{
+    const a = e.target.closest && e.target.closest('a[href]');
+    if (a) prefetch(a.getAttribute('href'));
+  }}, {{passive: true}});"""
+    else:
+        start = "(window.requestIdleCallback || setTimeout)(() => urls.forEach(prefetch));"
+    return f"""
+<script type="speculationrules">{rules}</script>
+<script>
+(function () {{
+  if (HTMLScriptElement.supports && HTMLScriptElement.supports('speculationrules')) return;
+  const urls = {url_list};
+  const done = new Set();
+  function prefetch(href) {{
+    if (done.has(href) || !urls.includes(href)) return;
+    done.add(href);
+    const link = document.createElement('link');
+    link.rel = 'prefetch';
+    link.href = href;
+    document.head.appendChild(link);
+  }}
+  {start}
+}})();
+</script>
+"""
+
 def list_items(items):
     return "".join(f"<li>{x if x.endswith('.') else x + '.'}</li>" for x in items)
 
 def service_html(slug):
-    s = SERVICE_BY_SLUG[slug]
-    img_file = SERVICE_IMAGES.get(slug, "symbol.png")
+    site = tenant()
+    s = site.service_by_slug[slug]
+    img_file = service_image(site, slug)
+    visual = f"""<img src="{static_url(img_file)}" alt="{s['title']}"{img_attrs(img_file)} style="{img_placeholder(img_file)}width:100%;height:100%;object-fit:cover;border-radius:18px">""" if img_file else ""
 
     long_copy_html = f"""
 <section style="padding:48px 0 8px">
   <div class="container">
     <article class="glass prose">
-      {s.get("long_copy","")}
+      {rewrite_static_refs(s.get("long_copy",""))}
     </article>
   </div>
 </section>
@@ -1048,7 +2149,7 @@ def service_html(slug):
 """
 
     return (
-        head(f"{s['title']} — {BRAND}", s["summary"])
+        head(f"{s['title']} — {site.brand}", s["summary"])
         + header_nav()
         + f"""
 <section class="hero" style="min-height:30vh">
@@ -1074,7 +2175,7 @@ def service_html(slug):
   <div class="container" style="display:grid;gap:18px;grid-template-columns:1.1fr .9fr">
     {value_block}
     <div class="glass" style="padding:0">
-      <img src="{url_for('static', filename=img_file)}" alt="{s['title']}" style="width:100%;height:100%;object-fit:cover;border-radius:18px">
+      {visual}
     </div>
   </div>
 </section>
@@ -1086,11 +2187,14 @@ def service_html(slug):
 # Articles HTML
 # -------------------
 def articles_list_html():
+    site = tenant()
     def card(a):
         tags = "".join(f'<span class="tag">{t}</span>' for t in a["tags"][:3])
+        image = pick_asset(site, a["image"])
+        img = f"""<img src="{static_url(image)}" alt="{a['title']}" loading="lazy"{img_attrs(image)} style="{img_placeholder(image)}">""" if image else ""
         return f"""
         <a class="card article-card" href="/articles/{a['slug']}">
-          <img src="{url_for('static', filename=a['image'])}" alt="{a['title']}" loading="lazy">
+          {img}
           <h3>{a['title']}</h3>
           <p>{a['excerpt']}</p>
           <div class="meta">
@@ -1099,7 +2203,9 @@ def articles_list_html():
           <div class="tags">{tags}</div>
         </a>
         """
-    cards = "".join(card(a) for a in ARTICLES)
+    cards = "".join(card(a) for a in site.articles)
+    side = pick_asset(site, "articles-side.jpg")
+    side_img = f"""<img src="{static_url(side)}" alt="Articles side visual"{img_attrs(side)} style="{img_placeholder(side)}width:100%;height:100%;object-fit:cover;border-radius:18px">""" if side else ""
 
     subscribe_block = f"""
 <div class="glass" style="padding:16px">
@@ -1107,6 +2213,7 @@ def articles_list_html():
   <form class="contact" method="post" action="/contact">
     <input type="text" name="name" placeholder="Your name" required>
     <input type="email" name="email" placeholder="Work email" required>
+    <input type="hidden" name="source" value="">
     <textarea name="message" placeholder="Tell us what topics you care about (optional)"></textarea>
     <div class="actions">
       <button class="btn primary" type="submit">Subscribe</button>
@@ -1116,7 +2223,7 @@ def articles_list_html():
 """
 
     return (
-        head(f"Articles — {BRAND}", "Insights on IT, security, data, and delivery.")
+        head(f"Articles — {site.brand}", "Insights on IT, security, data, and delivery.")
         + header_nav()
         + f"""
 <section class="articles-hero">
@@ -1136,32 +2243,53 @@ def articles_list_html():
   <div class="container" style="display:grid;gap:18px;grid-template-columns:1fr .9fr">
     {subscribe_block}
     <div class="glass" style="padding:0">
-      <img src="{url_for('static', filename='articles-side.jpg')}" alt="Articles side visual" style="width:100%;height:100%;object-fit:cover;border-radius:18px">
+      {side_img}
     </div>
   </div>
 </section>
 """
+        + speculation_rules([f"/articles/{a['slug']}" for a in site.articles])
         + footer_block()
     )
 
 def article_detail_html(slug):
-    a = ARTICLE_BY_SLUG[slug]
-    body_html = "".join(a["body"])
+    site = tenant()
+    a = site.article_by_slug[slug]
+    body_html = rewrite_static_refs("".join(a["body"]))
+    image = pick_asset(site, a["image"])
+    header_img = f"""<img src="{static_url(image)}" alt="{a['title']}"{img_attrs(image)} style="{img_placeholder(image)}">""" if image else ""
     tags = "".join(f'<span class="tag">{t}</span>' for t in a["tags"])
+    # The canonical origin, not the request's Host: cached pages are shared by every Host of a tenant
+    article_url = site.base_url.rstrip("/") + url_for("article", slug=slug)
     share = f"""
 <div class="share-row">
-  <a class="btn ghost" href="https://www.linkedin.com/shareArticle?mini=true&url={url_for('article', slug=slug, _external=True)}" target="_blank" rel="noopener">Share on LinkedIn</a>
-  <a class="btn ghost" href="https://twitter.com/intent/tweet?url={url_for('article', slug=slug, _external=True)}&text={a['title'].replace(' ', '%20')}" target="_blank" rel="noopener">Post on X</a>
+  <a class="btn ghost" href="https://www.linkedin.com/shareArticle?mini=true&url={article_url}" target="_blank" rel="noopener">Share on LinkedIn</a>
+  <a class="btn ghost" href="https://twitter.com/intent/tweet?url={article_url}&text={a['title'].replace(' ', '%20')}" target="_blank" rel="noopener">Post on X</a>
 </div>
 """
+    related_block = ""
+    related = [site.article_by_slug[r] for r in site.related.related(slug)]
+    if related:
+        cards = "".join(f"""
+      <a class="card related-card" href="/articles/{r['slug']}">
+        <h3>{r['title']}</h3>
+        <div class="meta">{r['date']} • {r['reading_time']}</div>
+      </a>""" for r in related)
+        related_block = f"""
+    <section class="related" aria-label="Related reading">
+      <h2 class="h2" style="font-size:24px">Related reading</h2>
+      <div class="related-grid">{cards}
+      </div>
+    </section>"""
+
     return (
-        head(f"{a['title']} — {BRAND}", a["excerpt"])
+        head(f"{a['title']} — {site.brand}", a["excerpt"])
         + header_nav()
         + f"""
 <section style="padding:26px 0 8px">
   <div class="container">
     <div class="article-header">
-      <img src="{url_for('static', filename=a['image'])}" alt="{a['title']}">
+      {header_img}
     </div>
   </div>
 </section>
@@ -1176,6 +2304,7 @@ def article_detail_html(slug):
       {body_html}
     </article>
     <div style="margin-top:14px">{share}</div>
+    {related_block}
     <div class="cta" style="margin-top:20px">
       <a class="btn primary" href="/#contact">Talk to an expert</a>
       <a class="btn ghost" href="/articles">Back to articles</a>
@@ -1183,44 +2312,1658 @@ def article_detail_html(slug):
   </div>
 </section>
 """
+        + speculation_rules([f"/articles/{r['slug']}" for r in related])
         + footer_block()
     )
 
+# -------------------
+# Content versions, ETags & surrogate keys
+# Each surrogate key ("chrome", "home", "articles", "service:<slug>", "article:<slug>")
+# has a version digest; a page's ETag is derived from the versions of its keys.
+# -------------------
+PURGE_URL = EDGE_TTL = None    # set by create_app()
+
+def _digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+def asset_digest(site, name):
+    entry = site.assets.get(site.asset_names.get(name.lower())) if name else None
+    return entry["digest"] if entry else None
+
+APP_SOURCE_DIGEST = None
+
+def compute_content_versions(site):
+    digest = lambda name: asset_digest(site, name)
+    versions = {
+        "chrome": _digest(APP_SOURCE_DIGEST, Image is not None, site.brand, site.base_url, site.stories_label,
+                          site.palette, site.logo_file, digest(site.logo_file), digest("hero.jpg"),
+                          SPECULATION_EAGERNESS, SPECULATION_ACTION, SPECULATION_MAX, PARTIAL_NAV),
+        "home": _digest(site.description, site.contact, site.story, site.ops_slides, site.video_file,
+                        digest(site.video_file), digest("case.jpg"), [digest(s["img"]) for s in site.ops_slides]),
+        "articles": _digest(digest("articles-side.jpg")),
+    }
+    for s in site.services:
+        img = service_image(site, s["slug"])
+        versions[f"service:{s['slug']}"] = _digest(s, img, digest(img),
+                                                  [digest(n) for n in _STATIC_REF.findall(s.get("long_copy", ""))])
+    by_slug = site.article_by_slug
+    for a in site.articles:
+        related = [(r, by_slug[r]["title"], by_slug[r]["date"], by_slug[r]["reading_time"])
+                   for r in site.related.related(a["slug"])]
+        versions[f"article:{a['slug']}"] = _digest(a, digest(a["image"]), related,
+                                                  [digest(n) for n in _STATIC_REF.findall("".join(a["body"]))])
+    return versions
+
+PURGE_LOG = deque(maxlen=50)
+SHARED_PAGE_CACHE = STALE_WHILE_REVALIDATE = None    # set by create_app()
+
+class PageCache:
+    # Rendered pages keyed by (tenant, path) and ETag. With shared=True every version is
+    # published once as CACHE_DIR/pages/<key>-<etag>.html (write + rename) and mapped
+    # read-only, so all worker processes share one copy through the OS page cache.
+    # Misses are single-flight: one render per key, concurrent requests wait for it.
+    # With stale_while_revalidate, purged entries are kept and served while a
+    # background render replaces them.
+    def __init__(self, root, shared=True, stale_while_revalidate=False):
+        self.root = root
+        self.shared = shared
+        self.stale_while_revalidate = stale_while_revalidate
+        self.local = {}  # key -> {"etag", "view", "tags"}
+        self.flights = {}  # (key, etag) -> {"done", "view", "error"}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def _stem(self, key):
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:20]
+
+    def _path(self, key, etag):
+        return os.path.join(self.root, f"{self._stem(key)}-{etag}.html")
+
+    def _map(self, path):
+        with open(path, "rb") as f:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def get(self, key, etag, tags=()):
+        entry = self.local.get(key)
+        if entry is not None and entry["etag"] == etag:
+            return entry["view"]
+        if not self.shared:
+            return None
+        try:
+            view = self._map(self._path(key, etag))
+        except (OSError, ValueError):
+            return None
+        with self.lock:
+            self.local[key] = {"etag": etag, "view": view, "tags": list(tags)}
+        return view
+
+    def publish(self, key, etag, body, tags=()):
+        view = memoryview(body)
+        if self.shared:
+            path = self._path(key, etag)
+            try:
+                write_atomic(path, body)
+                stem = self._stem(key) + "-"
+                for name in os.listdir(self.root):
+                    if name.startswith(stem) and os.path.join(self.root, name) != path:
+                        try:
+                            os.remove(os.path.join(self.root, name))
+                        except OSError:
+                            pass
+                view = self._map(path)
+            except (OSError, ValueError):
+                pass
+        with self.lock:
+            self.local[key] = {"etag": etag, "view": view, "tags": list(tags)}
+        return view
+
+    @contextmanager
+    def _render_lock(self, key):
+        # Across workers: whoever gets the lock renders, the rest map its file
+        if not self.shared:
+            yield
+            return
+        with file_lock(os.path.join(self.root, self._stem(key) + ".lock")):
+            yield
+
+    def render(self, key, etag, tags, build):
+        view = self.get(key, etag, tags)
+        if view is not None:
+            return view
+        with self.lock:
+            flight = self.flights.get((key, etag))
+            leader = flight is None
+            if leader:
+                flight = self.flights[(key, etag)] = {"done": threading.Event(), "view": None, "error": None}
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["view"]
+        try:
+            with self._render_lock(key):
+                view = self.get(key, etag, tags)
+                if view is None:
+                    view = self.publish(key, etag, build(), tags)
+            flight["view"] = view
+            return view
+        except Exception as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[(key, etag)]
+            flight["done"].set()
+
+    def stale(self, key):
+        # (etag, view) of any older version still held locally or on disk
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry["etag"], entry["view"]
+        if not self.shared:
+            return None
+        stem = self._stem(key) + "-"
+        try:
+            names = [n for n in os.listdir(self.root) if n.startswith(stem) and n.endswith(".html")]
+        except OSError:
+            return None
+        for name in names:
+            try:
+                return name[len(stem):-len(".html")], self._map(os.path.join(self.root, name))
+            except (OSError, ValueError):
+                continue
+        return None
+
+    def refresh(self, key, fn):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        def run():
+            try:
+                fn()
+            except Exception as e:
+                print(f"[pages] background render of {key[1]} failed: {e}", file=sys.stderr)
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+        threading.Thread(target=run, name="page-refresh", daemon=True).start()
+
+    def drop(self, tags):
+        if self.stale_while_revalidate:
+            return
+        tags = set(tags)
+        with self.lock:
+            for k in [k for k, e in self.local.items() if tags & set(e["tags"])]:
+                del self.local[k]
+
+def site_routes(site):
+    # Every cacheable page: (path, builder, builder args)
+    return ([("/", home_html, ()), ("/articles", articles_list_html, ())]
+            + [(f"/services/{x['slug']}", service_html, (x["slug"],)) for x in site.services]
+            + [(f"/articles/{a['slug']}", article_detail_html, (a["slug"],)) for a in site.articles])
+
+def page_tags(site, path):
+    if path == "/":
+        return ["chrome", "home"] + [f"service:{s['slug']}" for s in site.services]
+    if path == "/articles":
+        return ["chrome", "articles"] + [f"article:{a['slug']}" for a in site.articles]
+    kind, _, slug = path.strip("/").partition("/")
+    return ["chrome", f"{kind.rstrip('s')}:{slug}"]
+
+def page_etag(site, path, tags):
+    return _digest(site.name, path, [(t, site.content_versions.get(t)) for t in tags])
+
+def emit_purge(site, keys, reason="content change"):
+    keys = sorted(set(keys))
+    if not keys:
+        return keys
+    site.pages.drop(keys)
+    keys = site.surrogate_keys(keys)
+    PURGE_LOG.append({"at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "tenant": site.name,
+                      "keys": keys, "reason": reason})
+    print(f"[purge] {reason}: {' '.join(keys)}", file=sys.stderr)
+    if PURGE_URL:
+        def post():
+            req = urllib.request.Request(PURGE_URL, data=json.dumps({"surrogate_keys": keys}).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+            try:
+                urllib.request.urlopen(req, timeout=5).close()
+            except Exception as e:
+                print(f"[purge] delivery to {PURGE_URL} failed: {e}", file=sys.stderr)
+        threading.Thread(target=post, daemon=True).start()
+    return keys
+
+def publish_content():
+    return [key for site in TENANTS.values() for key in publish_tenant(site)]
+
+def prepare_tenant(site):
+    site.service_by_slug = {x["slug"]: x for x in site.services}
+    site.article_by_slug = {a["slug"]: a for a in site.articles}
+    site.related.sync(site.articles)
+    site.content_versions = compute_content_versions(site)
+    site.api_cache = {}
+
+def publish_tenant(site):
+    # Compare against the versions last published (persisted across deploys) and purge the difference
+    prepare_tenant(site)
+    versions = site.content_versions
+    state_path = os.path.join(site.cache_dir, "content-versions.json")
+    with file_lock(state_path + ".lock"):
+        try:
+            with open(state_path, encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+        changed = [k for k in set(versions) | set(previous) if versions.get(k) != previous.get(k)]
+        if changed:
+            write_atomic(state_path, json.dumps(versions, sort_keys=True).encode("utf-8"))
+    return emit_purge(site, changed)
+
+def page_store(site):
+    # The profiler marks the requests it wants rendered uncached (?render=1)
+    return UNCACHED_PAGES if request.environ.get("gopartnerr.uncached") else site.pages
+
+def render_page(build, *args):
+    # Keyed by the resolved tenant, never the raw Host header: unknown Hosts share
+    # the default site's entries instead of minting new ones
+    site, path = tenant(), request.path
+    tags = page_tags(site, path)
+    return page_store(site).render((site.name, path), page_etag(site, path, tags), tags, lambda: build(*args).encode("utf-8"))
+
+def refresh_page(build, *args):
+    app, path, base_url = current_app._get_current_object(), request.path, request.host_url
+    def run():
+        with app.test_request_context(path, base_url=base_url):
+            render_page(build, *args)
+    site = tenant()
+    site.pages.refresh((site.name, path), run)
+
+_MAIN_OPEN = b'<main id="main" tabindex="-1">'
+_MAIN_CLOSE = b"</main>"
+_PAGE_META = re.compile(rb'<title>(.*?)</title><meta name="description" content="(.*?)"/>', re.S)
+
+def main_fragment(view):
+    # (title, description, view of <main>'s contents) sliced from a cached page, no copy
+    page = view.obj    # bytes or mmap, both searchable
+    start, end = page.find(_MAIN_OPEN), page.rfind(_MAIN_CLOSE)
+    meta = _PAGE_META.search(page, 0, max(start, 0))
+    if start < 0 or end < start or meta is None:
+        return None
+    return (meta.group(1).decode("utf-8"), meta.group(2).decode("utf-8"),
+            view[start + len(_MAIN_OPEN):end])
+
+def page_response(build, *args):
+    site, path = tenant(), request.path
+    pages = page_store(site)
+    tags = page_tags(site, path)
+    etag = page_etag(site, path, tags)
+    fragment = request.headers.get("X-Fragment") == "main"
+    suffix = "-main" if fragment else ""
+    headers = {
+        "Cache-Control": "public, no-cache",
+        "Surrogate-Control": f"max-age={EDGE_TTL}",
+        "Surrogate-Key": " ".join(site.surrogate_keys(tags)),
+        "Vary": "X-Fragment",
+    }
+    view = None
+    if not request.if_none_match.contains_weak(etag + suffix):
+        view = pages.get((site.name, path), etag, tags)
+        stale = pages.stale((site.name, path)) if view is None and pages.stale_while_revalidate else None
+        if stale is not None:
+            refresh_page(build, *args)
+            etag, view = stale
+            if request.if_none_match.contains_weak(etag + suffix):
+                view = None
+        elif view is None:
+            try:
+                view = render_page(admitted("render", build), *args)
+            except Overloaded:
+                return overloaded()
+    if fragment and view is not None:
+        parts = main_fragment(view)
+        if parts is None:
+            suffix = ""    # no <main> to cut out: send the whole page
+        else:
+            title, description, view = parts
+            headers.update({"X-Page-Title": quote(title), "X-Page-Description": quote(description)})
+    if fragment and suffix:
+        headers["X-Fragment"] = "main"
+    if view is None:
+        resp = Response(status=304, headers=headers)
+    else:
+        resp = Response(view.tobytes(), mimetype="text/html", headers=headers)
+    resp.set_etag(etag + suffix)
+    return resp
+
+# -------------------
+# JSON API: payloads serialised once per content version and kept as bytes.
+# Heavy fields (long_copy, body) are only included when asked for via fields=.
+# -------------------
+API_HEAVY = {"service": {"long_copy"}, "article": {"body"}}
+API_PAGE_SIZE = 20
+_API_LOCK = threading.Lock()
+
+def api_item(kind, obj):
+    site = tenant()
+    if kind == "service":
+        img = service_image(site, obj["slug"])
+        item = dict(obj, url=f"/services/{obj['slug']}", image=static_url(img) if img else None)
+        item["long_copy"] = rewrite_static_refs(obj.get("long_copy", ""))
+    else:
+        image = pick_asset(site, obj["image"])
+        item = dict(obj, url=f"/articles/{obj['slug']}", image=static_url(image) if image else None,
+                    related=site.related.related(obj["slug"]))
+        item["body"] = rewrite_static_refs("".join(obj["body"]))
+    return item
+
+def api_fields(kind, sample):
+    raw = request.args.get("fields", "").strip()
+    known = set(sample) | {"url", "image"} | ({"related"} if kind == "article" else set())
+    if raw == "*":
+        return None
+    if not raw:
+        return sorted(known - API_HEAVY[kind])
+    fields = sorted({f.strip() for f in raw.split(",") if f.strip()} | {"slug"})
+    unknown = [f for f in fields if f not in known]
+    if unknown:
+        raise ValueError("unknown field(s): " + ", ".join(unknown))
+    return fields
+
+def api_project(item, fields):
+    return item if fields is None else {f: item[f] for f in fields if f in item}
+
+def api_error(status, message):
+    return Response(json.dumps({"error": message}), status=status, mimetype="application/json")
+
+def api_response(key, tags, build):
+    site = tenant()
+    etag = _digest("api", APP_SOURCE_DIGEST, site.name, key, [(t, site.content_versions.get(t)) for t in tags])
+    headers = {"Cache-Control": "public, no-cache", "Surrogate-Control": f"max-age={EDGE_TTL}",
+               "Surrogate-Key": " ".join(site.surrogate_keys(["api"] + tags)), "Access-Control-Allow-Origin": "*"}
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304, headers=headers)
+    else:
+        cache = site.api_cache
+        body = cache.get(etag)
+        if body is None:
+            body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            with _API_LOCK:
+                if len(cache) >= 512:
+                    cache.clear()
+                cache[etag] = body
+        resp = Response(body, mimetype="application/json", headers=headers)
+    resp.set_etag(etag)
+    return resp
+
+def encode_cursor(slug):
+    return base64.urlsafe_b64encode(slug.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+
+# -------------------
+# Service worker: precache manifest of routes + hashed assets. Each entry carries a
+# revision (page ETag / asset digest) so a new worker only refetches what changed.
+# -------------------
+SW_MAX_ASSET = None    # set by create_app()
+
+SW_TEMPLATE = """
+const PRECACHE = __PRECACHE__;
+const CACHE = 'gp-precache';
+const RUNTIME = 'gp-runtime';
+const REVS = '/__sw-revisions';
+
+async function revisions(cache) {
+  const res = await cache.match(REVS);
+  return res ? res.json() : {};
+}
+
+self.addEventListener('install', event => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    const revs = await revisions(cache);
+    await Promise.all(PRECACHE.filter(([url, rev]) => revs[url] !== rev).map(async ([url, rev]) => {
+      try {
+        const res = await fetch(url, {cache: 'no-cache', credentials: 'same-origin', headers: {'X-Precache': '1'}});
+        if (res.ok) { await cache.put(url, res); revs[url] = rev; }
+      } catch (e) {}
+    }));
+    await cache.put(REVS, new Response(JSON.stringify(revs)));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil((async () => {
+    const keep = new Set(PRECACHE.map(([url]) => new URL(url, self.location).href));
+    keep.add(new URL(REVS, self.location).href);
+    const cache = await caches.open(CACHE);
+    for (const req of await cache.keys()) {
+      if (!keep.has(req.url)) await cache.delete(req);
+    }
+    // Forget the revisions of what was just deleted, so a URL added back is fetched again
+    const revs = await revisions(cache);
+    for (const url of Object.keys(revs)) {
+      if (!keep.has(new URL(url, self.location).href)) delete revs[url];
+    }
+    await cache.put(REVS, new Response(JSON.stringify(revs)));
+    const runtime = await caches.open(RUNTIME);
+    for (const req of await runtime.keys()) {
+      if (!req.url.includes('/assets/')) await runtime.delete(req);
+    }
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('fetch', event => {
+  const req = event.request;
+  const url = new URL(req.url);
+  if (req.method !== 'GET' || url.origin !== self.location.origin) return;
+  if (url.pathname.startsWith('/admin') || url.pathname === '/sw.js') return;
+  if (req.headers.get('X-Fragment')) return;
+
+  if (url.pathname.startsWith('/assets/')) {
+    event.respondWith((async () => {
+      const hit = await caches.match(req);
+      if (hit) return hit;
+      const res = await fetch(req);
+      if (res.ok) (await caches.open(RUNTIME)).put(req, res.clone());
+      return res;
+    })());
+    return;
+  }
+
+  if (req.mode === 'navigate' || (req.headers.get('accept') || '').includes('text/html')) {
+    event.respondWith((async () => {
+      const cache = await caches.open(CACHE);
+      const cached = await cache.match(req, {ignoreSearch: true});
+      const network = fetch(req).then(res => {
+        if (res.ok && res.type === 'basic') cache.put(url.pathname, res.clone());
+        return res;
+      });
+      if (cached) {
+        event.waitUntil(network.catch(() => {}));
+        return cached;
+      }
+      try {
+        return await network;
+      } catch (e) {
+        return (await cache.match('/')) || new Response('Offline', {status: 503});
+      }
+    })());
+  }
+});
+"""
+
+def sw_precache():
+    site = tenant()
+    entries = []
+    for path, _, _ in site_routes(site):
+        entries.append([path, page_etag(site, path, page_tags(site, path))])
+    for name, entry in sorted(site.assets.items()):
+        ext = os.path.splitext(name.lower())[1]
+        if ext in VIDEO_EXTS or (entry["size"] > SW_MAX_ASSET and name != site.logo_file):
+            continue
+        entries.append([static_url(name), entry["digest"]])
+    return entries
+
+def service_worker_js():
+    return SW_TEMPLATE.replace("__PRECACHE__", json.dumps(sw_precache()))
+
+# -------------------
+# Request metrics (in-flight gauge for monitoring and the load-test harness)
+# -------------------
+METRICS = {"inflight": 0, "peak_inflight": 0, "requests": 0, "started": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+_METRICS_LOCK = threading.Lock()
+
+@hook("before_request")
+def _track_request_start():
+    request.environ["gopartnerr.tracked"] = True
+    with _METRICS_LOCK:
+        METRICS["inflight"] += 1
+        METRICS["requests"] += 1
+        METRICS["peak_inflight"] = max(METRICS["peak_inflight"], METRICS["inflight"])
+
+@hook("teardown_request")
+def _track_request_end(exc=None):
+    # Contexts pushed by warmup never dispatched, so they were never counted
+    if not request.environ.pop("gopartnerr.tracked", False):
+        return
+    with _METRICS_LOCK:
+        METRICS["inflight"] -= 1
+
+# -------------------
+# Admission control. Each route class gets its own concurrency limit and a short
+# bounded queue, so slow /contact posts and renders can't take the slots of cheap
+# requests. Over the limit (or after ADMISSION_WAIT in the queue) the request gets
+# an immediate 503 with Retry-After. Expensive classes don't queue at all while a
+# cheap class is already queueing. GOPARTNERR_ADMISSION overrides the limits as
+# "class=limit/queue,..."; set it to 0 to turn admission control off.
+# -------------------
+ADMISSION_DEFAULTS = {"static": (64, 64), "page": (32, 64), "render": (4, 16), "post": (4, 8)}
+ADMISSION_CHEAP = ("static", "page")
+ADMISSION_WAIT = ADMISSION_RETRY_AFTER = None    # set by create_app()
+ADMISSION_CLASSES = {
+    "static": "static", "asset": "static", "service_worker": "static",
+    "home": "page", "service": "page", "articles": "page", "article": "page",
+    "api_services": "page", "api_service": "page", "api_articles": "page", "api_article": "page",
+    "contact_post": "post",
+}
+
+class AdmissionGate:
+    def __init__(self, name, limit, queue):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, wait, may_queue=True):
+        with self.cond:
+            if self.active < self.limit:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if not may_queue or self.waiting >= self.queue:
+                self.shed += 1
+                return False
+            self.waiting += 1
+            deadline = time.monotonic() + wait
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return False
+                    self.cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+    def snapshot(self):
+        return {"limit": self.limit, "queue": self.queue, "active": self.active,
+                "waiting": self.waiting, "admitted": self.admitted, "shed": self.shed}
+
+def parse_admission(spec):
+    gates = dict(ADMISSION_DEFAULTS)
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        limit, _, queue = value.partition("/")
+        gates[name.strip()] = (int(limit), int(queue or 0))
+    return {name: AdmissionGate(name, limit, queue) for name, (limit, queue) in gates.items()}
+
+ADMISSION = {}    # class -> AdmissionGate, set by create_app()
+
+def admit(kind):
+    gate = ADMISSION.get(kind)
+    if gate is None:
+        return True
+    may_queue = kind in ADMISSION_CHEAP or not any(ADMISSION[c].waiting for c in ADMISSION_CHEAP if c in ADMISSION)
+    return gate.acquire(ADMISSION_WAIT, may_queue)
+
+def release(kind):
+    if kind in ADMISSION:
+        ADMISSION[kind].release()
+
+def overloaded():
+    headers = {"Retry-After": ADMISSION_RETRY_AFTER, "Cache-Control": "no-store"}
+    message = "We're busy right now. Please try again in a moment."
+    if request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json":
+        return Response(json.dumps({"ok": False, "message": message}), status=503, mimetype="application/json", headers=headers)
+    return Response(message, status=503, mimetype="text/plain", headers=headers)
+
+class Overloaded(Exception):
+    pass
+
+def admitted(kind, build):
+    # Only the request that actually runs `build` takes a `kind` slot; requests
+    # coalesced onto its render (PageCache single-flight) wait without one and
+    # share its Overloaded if it is shed.
+    def run(*args):
+        if not admit(kind):
+            raise Overloaded()
+        try:
+            return build(*args)
+        finally:
+            release(kind)
+    return run
+
+@hook("before_request")
+def _admit_request():
+    kind = ADMISSION_CLASSES.get(request.endpoint)
+    if kind is None:
+        return None
+    if not admit(kind):
+        return overloaded()
+    request.environ["gopartnerr.admitted"] = kind
+
+@hook("teardown_request")
+def _release_request(exc=None):
+    kind = request.environ.pop("gopartnerr.admitted", None)
+    if kind is not None:
+        release(kind)
+
+# -------------------
+# Analytics: page views and /contact conversions counted per tenant, route, slug and
+# referrer class. Each increment borrows a counts dict from a pool (deque pop/append,
+# no locks on the request path; the pool only grows to the peak number of concurrent
+# increments, however many threads a thread-per-request server starts); a background
+# thread folds the deltas into one JSON file per tenant and day
+# (ANALYTICS_DIR/<tenant>/<day>.json).
+# Only requests that reach this process are counted: pages answered by the CDN from
+# its Surrogate-Control cache are not, so behind a CDN these are lower bounds.
+# -------------------
+ANALYTICS_DIR = None
+ANALYTICS_FLUSH = None    # set by create_app()
+# "x.com" matches that host and its subdomains; "google." is the google label under
+# any suffix (google.com, www.google.co.uk)
+SEARCH_HOSTS = ("google.", "bing.com", "duckduckgo.com", "yahoo.", "baidu.com", "yandex.", "ecosia.org")
+SOCIAL_HOSTS = ("linkedin.com", "lnkd.in", "twitter.com", "t.co", "x.com", "facebook.com", "instagram.com",
+                "reddit.com", "youtube.com", "youtu.be")
+PAGE_ENDPOINTS = {"home", "service", "articles", "article"}
+
+_shards = []             # [counts, flushed] per pooled counts dict
+_free_shards = deque()   # counts dicts not being incremented right now
+_shards_lock = threading.Lock()    # growing the pool and flushing only
+_flush_lock = threading.Lock()
+
+def record(site_name, kind, value):
+    try:
+        counts = _free_shards.pop()
+    except IndexError:
+        counts = {}
+        with _shards_lock:
+            _shards.append([counts, {}])
+    key = (int(time.time()) // 86400, site_name, kind, value)
+    counts[key] = counts.get(key, 0) + 1
+    _free_shards.append(counts)
+
+def host_in(host, domains):
+    for d in domains:
+        if d.endswith("."):
+            if host.startswith(d) or "." + d in host:
+                return True
+        elif host == d or host.endswith("." + d):
+            return True
+    return False
+
+def referrer_class(referrer, own_host):
+    if not referrer:
+        return "direct"
+    try:
+        host = (urlsplit(referrer).hostname or "").lower()
+    except ValueError:    # malformed, e.g. an unclosed IPv6 bracket
+        return "other"
+    if not host:
+        return "direct"
+    if host == own_host.split(":")[0].lower():
+        return "internal"
+    if host_in(host, SEARCH_HOSTS):
+        return "search"
+    if host_in(host, SOCIAL_HOSTS):
+        return "social"
+    return "other"
+
+def source_key(path):
+    site = tenant()
+    kind, _, slug = (path or "").strip("/").partition("/")
+    if kind == "services" and slug in site.service_by_slug:
+        return f"service:{slug}"
+    if kind == "articles" and slug in site.article_by_slug:
+        return f"article:{slug}"
+    return {"": "home", "articles": "articles"}.get(kind if not slug else None, "unknown")
+
+def record_conversion(source):
+    name = tenant().name
+    record(name, "conversion", "total")
+    record(name, "conversion", source_key(source))
+
+def speculative(environ):
+    # Speculation Rules prefetch/prerender, <link rel=prefetch> and service-worker
+    # precache fetches (marked X-Precache, since JS can't set Sec-Purpose) are not views
+    if environ.get("HTTP_X_PRECACHE") == "1":
+        return True
+    purpose = (environ.get("HTTP_SEC_PURPOSE") or environ.get("HTTP_PURPOSE") or "").lower()
+    return "prefetch" in purpose or "prerender" in purpose
+
+def internal_client(app):
+    # Test client for CLI commands: its requests are not views and don't start the
+    # background threads (analytics flusher, lead dispatch, warmup) or publish content
+    # versions and CDN purges in the CLI process
+    client = app.test_client()
+    client.environ_base["gopartnerr.internal"] = True
+    return client
+
+@hook("after_request")
+def _record_page_view(resp):
+    if request.method == "GET" and request.endpoint in PAGE_ENDPOINTS and resp.status_code in (200, 304) \
+            and not speculative(request.environ) and "gopartnerr.internal" not in request.environ:
+        name = tenant().name
+        record(name, "view", request.endpoint)
+        slug = (request.view_args or {}).get("slug")
+        if slug:
+            record(name, "slug", f"{request.endpoint}:{slug}")
+        record(name, "ref", referrer_class(request.referrer, request.host))
+    return resp
+
+def flush_analytics():
+    with _flush_lock:
+        deltas = {}
+        with _shards_lock:
+            shards = list(_shards)
+        yesterday = int(time.time()) // 86400 - 1
+        for shard in shards:
+            counts, flushed = shard
+            snapshot = counts.copy()
+            for key, n in snapshot.items():
+                if n != flushed.get(key, 0):
+                    deltas[key] = deltas.get(key, 0) + n - flushed.get(key, 0)
+            for key in [key for key in snapshot if key[0] < yesterday]:    # past days are final
+                counts.pop(key, None)
+                del snapshot[key]
+            shard[1] = snapshot
+        by_file = {}
+        for (day, site_name, kind, value), n in deltas.items():
+            bucket = by_file.setdefault((site_name, day), {}).setdefault(kind, {})
+            bucket[value] = bucket.get(value, 0) + n
+        for (site_name, day), counts in by_file.items():
+            name = (datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(days=day)).strftime("%Y-%m-%d")
+            path = analytics_path(site_name, name)
+            with file_lock(path + ".lock"):
+                stored = read_analytics(site_name, name)
+                for kind, values in counts.items():
+                    bucket = stored.setdefault(kind, {})
+                    for value, n in values.items():
+                        bucket[value] = bucket.get(value, 0) + n
+                write_atomic(path, json.dumps(stored, separators=(",", ":"), sort_keys=True).encode("utf-8"))
+
+def analytics_path(site_name, day):
+    return os.path.join(ANALYTICS_DIR, site_name, day + ".json")
+
+def read_analytics(site_name, day):
+    try:
+        with open(analytics_path(site_name, day), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _analytics_flusher():
+    while True:
+        time.sleep(ANALYTICS_FLUSH)
+        try:
+            flush_analytics()
+        except Exception as e:
+            print(f"[analytics] flush failed: {e}", file=sys.stderr)
+
+# -------------------
+# Profiling (admin, GOPARTNERR_PROFILING=1). Nothing below is attached to the app
+# unless the gate is on. A session runs for ?seconds= or until ?requests= requests
+# have finished, whichever comes first:
+#   /admin/profile/cpu    samples request threads every ?interval= ms and returns
+#                         collapsed stacks (flamegraph.pl / speedscope input)
+#   /admin/profile/alloc  tracemalloc diff per request, summed per route (JSON).
+#                         Snapshots are process-wide, so profile at low concurrency.
+# With ?render=1, requests sent with "X-Profile-Render: 1" while the session runs
+# bypass the page cache so the page builders run; other traffic stays cached.
+# -------------------
+PROFILE_MAX_SECONDS = 300
+_PROFILED = {}    # thread ident -> endpoint, for requests in flight
+_PROFILE = {}     # "cpu" / "alloc" -> active session
+_PROFILE_LOCK = threading.Lock()
+
+class UncachedPages(PageCache):
+    def get(self, key, etag, tags=()):
+        return None
+
+    def publish(self, key, etag, body, tags=()):
+        return memoryview(body)
+
+UNCACHED_PAGES = UncachedPages(None, shared=False)
+
+def _profile_request_start():
+    _PROFILED[threading.get_ident()] = request.endpoint or "-"
+    if request.headers.get("X-Profile-Render") == "1" and any(s["render"] for s in list(_PROFILE.values())):
+        request.environ["gopartnerr.uncached"] = True
+    if "alloc" in _PROFILE and tracemalloc.is_tracing():
+        request.environ["gopartnerr.snapshot"] = tracemalloc.take_snapshot()
+
+def _profile_request_end(exc=None):
+    endpoint = _PROFILED.pop(threading.get_ident(), None)
+    if endpoint is None:
+        return
+    alloc = _PROFILE.get("alloc")
+    before = request.environ.pop("gopartnerr.snapshot", None)
+    if alloc is not None and before is not None:
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        diff = tracemalloc.take_snapshot().filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+        with _PROFILE_LOCK:
+            route = alloc["routes"].setdefault(endpoint, {"requests": 0, "lines": {}})
+            route["requests"] += 1
+            for stat in diff:
+                if stat.size_diff or stat.count_diff:
+                    frame = stat.traceback[0]
+                    where = f"{os.path.basename(frame.filename)}:{frame.lineno}"
+                    size, count = route["lines"].get(where, (0, 0))
+                    route["lines"][where] = (size + stat.size_diff, count + stat.count_diff)
+    for session in list(_PROFILE.values()):
+        session["seen"] += 1
+        if session["limit"] and session["seen"] >= session["limit"]:
+            session["done"].set()
+
+def _sample_stacks(session, interval):
+    while not session["done"].wait(interval):
+        frames = sys._current_frames()
+        for ident, endpoint in list(_PROFILED.items()):
+            frame = frames.get(ident)
+            stack = []
+            while frame is not None:
+                stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                session["stacks"][";".join([endpoint] + stack[::-1])] += 1
+                session["samples"] += 1
+
+def run_profile(kind, start=None):
+    # Claims the session slot, waits for the session to end and returns it; None if
+    # a session of this kind is running.
+    # start(session) may return a worker thread, joined before the session is read.
+    try:
+        seconds = min(float(request.args.get("seconds", "10")), PROFILE_MAX_SECONDS)
+        limit = int(request.args.get("requests", "0"))
+    except ValueError:
+        raise ValueError("seconds and requests must be numbers")
+    session = {"done": threading.Event(), "limit": limit, "seen": 0, "started": time.perf_counter(),
+               "stacks": Counter(), "samples": 0, "routes": {}, "render": request.args.get("render") == "1"}
+    with _PROFILE_LOCK:
+        if kind in _PROFILE:
+            return None
+        _PROFILE[kind] = session
+    _PROFILED.pop(threading.get_ident(), None)  # don't profile the profiler's own request
+    try:
+        worker = start(session) if start else None
+        session["done"].wait(seconds)
+        session["done"].set()
+        if worker is not None:
+            worker.join()
+    finally:
+        with _PROFILE_LOCK:
+            del _PROFILE[kind]
+    session["elapsed"] = round(time.perf_counter() - session["started"], 3)
+    return session
+
+def admin_profile_cpu():
+    if not admin_authorized():
+        return admin_denied()
+    try:
+        interval = max(float(request.args.get("interval", "5")), 1.0) / 1000
+        def start(session):
+            sampler = threading.Thread(target=_sample_stacks, args=(session, interval), name="profiler", daemon=True)
+            sampler.start()
+            return sampler
+        session = run_profile("cpu", start)
+    except ValueError as e:
+        return Response(str(e), status=400, mimetype="text/plain")
+    if session is None:
+        return Response("A CPU profile is already running", status=409, mimetype="text/plain")
+    body = "".join(f"{stack} {n}\n" for stack, n in session["stacks"].most_common())
+    return Response(body, mimetype="text/plain", headers={
+        "Cache-Control": "no-store", "X-Profile-Samples": str(session["samples"]),
+        "X-Profile-Requests": str(session["seen"]), "X-Profile-Seconds": str(session["elapsed"])})
+
+def admin_profile_alloc():
+    if not admin_authorized():
+        return admin_denied()
+    started = []
+    def start(session):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started.append(True)
+    try:
+        top = int(request.args.get("top", "15"))
+        session = run_profile("alloc", start)
+    except ValueError as e:
+        return Response(str(e), status=400, mimetype="text/plain")
+    finally:
+        if started:
+            tracemalloc.stop()
+    if session is None:
+        return Response("An allocation profile is already running", status=409, mimetype="text/plain")
+    routes = {}
+    for endpoint, route in session["routes"].items():
+        lines = sorted(route["lines"].items(), key=lambda kv: -abs(kv[1][0]))[:top]
+        routes[endpoint] = {"requests": route["requests"],
+                            "top": [{"where": w, "size_diff": size, "count_diff": count} for w, (size, count) in lines]}
+    body = {"seconds": session["elapsed"], "requests": session["seen"], "routes": routes}
+    return Response(json.dumps(body, indent=2), mimetype="application/json", headers={"Cache-Control": "no-store"})
+
+def install_profiling(app):
+    app.before_request(_profile_request_start)
+    app.teardown_request(_profile_request_end)
+    app.add_url_rule("/admin/profile/cpu", view_func=admin_profile_cpu, methods=["GET"])
+    app.add_url_rule("/admin/profile/alloc", view_func=admin_profile_alloc, methods=["GET"])
+
 # -------------------
 # Routes
 # -------------------
-@app.route("/")
+@route("/")
 def home():
-    return Response(home_html(), mimetype="text/html")
+    return page_response(home_html)
 
-@app.route("/services/<slug>")
+@route("/services/<slug>")
 def service(slug):
-    if slug not in SERVICE_BY_SLUG:
+    if slug not in tenant().service_by_slug:
         return redirect(url_for("home"))
-    return Response(service_html(slug), mimetype="text/html")
+    return page_response(service_html, slug)
 
-@app.route("/articles")
+@route("/articles")
 def articles():
-    return Response(articles_list_html(), mimetype="text/html")
+    return page_response(articles_list_html)
 
-@app.route("/articles/<slug>")
+@route("/articles/<slug>")
 def article(slug):
-    if slug not in ARTICLE_BY_SLUG:
+    if slug not in tenant().article_by_slug:
         return redirect(url_for("articles"))
-    return Response(article_detail_html(slug), mimetype="text/html")
+    return page_response(article_detail_html, slug)
 
-@app.post("/contact")
+@route("/api/services", methods=["GET"])
+def api_services():
+    services = tenant().services
+    try:
+        fields = api_fields("service", services[0] if services else {})
+    except ValueError as e:
+        return api_error(400, str(e))
+    tags = [f"service:{x['slug']}" for x in services]
+    return api_response(("services", fields), tags,
+                        lambda: {"items": [api_project(api_item("service", x), fields) for x in services]})
+
+@route("/api/services/<slug>", methods=["GET"])
+def api_service(slug):
+    service = tenant().service_by_slug.get(slug)
+    if service is None:
+        return api_error(404, "unknown service")
+    try:
+        fields = api_fields("service", service)
+    except ValueError as e:
+        return api_error(400, str(e))
+    return api_response(("service", slug, fields), [f"service:{slug}"],
+                        lambda: api_project(api_item("service", service), fields))
+
+@route("/api/articles", methods=["GET"])
+def api_articles():
+    tag = request.args.get("tag", "").strip().lower()
+    cursor = request.args.get("cursor", "")
+    articles = tenant().articles
+    try:
+        fields = api_fields("article", articles[0] if articles else {})
+        limit = max(1, min(100, int(request.args.get("limit", API_PAGE_SIZE))))
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return api_error(400, str(e))
+    matches = [a for a in articles if not tag or tag in (t.lower() for t in a["tags"])]
+    start = 0
+    if after is not None:
+        slugs = [a["slug"] for a in matches]
+        if after not in slugs:
+            return api_error(400, "invalid cursor")
+        start = slugs.index(after) + 1
+    page = matches[start:start + limit]
+    more = start + limit < len(matches)
+
+    def build():
+        return {"items": [api_project(api_item("article", a), fields) for a in page],
+                "next_cursor": encode_cursor(page[-1]["slug"]) if page and more else None}
+    tags = [f"article:{a['slug']}" for a in page] or ["articles"]
+    return api_response(("articles", tag, cursor, limit, fields, [a["slug"] for a in page], more), tags, build)
+
+@route("/api/articles/<slug>", methods=["GET"])
+def api_article(slug):
+    article = tenant().article_by_slug.get(slug)
+    if article is None:
+        return api_error(404, "unknown article")
+    try:
+        fields = api_fields("article", article)
+    except ValueError as e:
+        return api_error(400, str(e))
+    return api_response(("article", slug, fields), [f"article:{slug}"],
+                        lambda: api_project(api_item("article", article), fields))
+
+@route("/sw.js", methods=["GET"])
+def service_worker():
+    body = service_worker_js().encode("utf-8")
+    resp = Response(body, mimetype="application/javascript",
+                    headers={"Cache-Control": "no-cache", "Service-Worker-Allowed": "/"})
+    resp.set_etag(hashlib.sha256(body).hexdigest()[:16])
+    return resp.make_conditional(request)
+
+@route("/contact", methods=["POST"])
 def contact_post():
     name = request.form.get("name", "").strip()
     email = request.form.get("email", "").strip()
     message = request.form.get("message", "").strip()
     if not (name and email and message):
-        return Response(home_html(error_msg="Please fill out all fields."), mimetype="text/html")
-    save_lead_csv(name, email, message)
-    mailed = send_lead_email(name, email, message)
-    note = "Thanks — we received your message."
-    note += " (A copy was emailed to your inbox.)" if mailed else " (Saved to leads.csv. Configure SMTP to also receive emails.)"
-    return Response(home_html(success_msg=note), mimetype="text/html")
+        return contact_reply(error_msg="Please fill out all fields.")
+    site = tenant()
+    LEADS.append({"id": uuid.uuid4().hex, "received": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                  "tenant": site.name, "brand": site.brand, "name": name, "email": email, "message": message})
+    record_conversion(request.form.get("source", ""))
+    return contact_reply(success_msg="Thanks — we received your message.")
+
+def contact_reply(success_msg="", error_msg=""):
+    # fetch() clients get just the contact fragment or a JSON status; plain form posts
+    # keep getting the full home page.
+    headers = {"Cache-Control": "no-store", "Vary": "Accept, X-Fragment"}
+    status = 400 if error_msg else 200
+    if request.headers.get("X-Fragment") == "contact":
+        return Response(contact_band(success_msg, error_msg), status=status, mimetype="text/html", headers=headers)
+    if request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json":
+        body = {"ok": not error_msg, "message": error_msg or success_msg}
+        return Response(json.dumps(body, ensure_ascii=False), status=status, mimetype="application/json", headers=headers)
+    return Response(home_html(success_msg, error_msg), mimetype="text/html", headers=headers)
+
+@route("/static/<path:filename>", endpoint="static", methods=["GET"])
+def static_file(filename):
+    site = tenant()
+    while site is not None:
+        try:
+            return send_from_directory(site.static_dir, filename)
+        except NotFound:
+            site = site.fallback
+    return Response("Not found", status=404, mimetype="text/plain")
+
+@route("/assets/<digest>/<path:filename>", methods=["GET"])
+def asset(digest, filename):
+    entry = tenant().assets.get(filename)
+    if entry is None:
+        return Response("Not found", status=404, mimetype="text/plain")
+    if entry["digest"] != digest:
+        return redirect(static_url(filename))
+    resp = send_file(entry["path"], max_age=ASSET_MAX_AGE)
+    resp.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    return resp
+
+@route("/admin/leads", methods=["GET"])
+def admin_leads():
+    if not admin_authorized():
+        return admin_denied()
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in ("csv", "ndjson"):
+        return Response("format must be csv or ndjson", status=400, mimetype="text/plain")
+    try:
+        start = int(request.args.get("cursor", "0"))
+        since = _parse_when(request.args["since"]) if request.args.get("since") else None
+        until = _parse_when(request.args["until"], end_of_day=True) if request.args.get("until") else None
+    except ValueError:
+        return Response("Invalid cursor or date", status=400, mimetype="text/plain")
+    end = leads_size()
+    if start < 0 or start > end:
+        return Response("Cursor out of range", status=400, mimetype="text/plain")
+    name = request.args.get("tenant", tenant().name)    # the Host's tenant unless one is named
+    if name not in TENANTS:
+        return Response("Unknown tenant", status=400, mimetype="text/plain")
+    keep = lead_filter(since, until, request.args.get("email"), name)
+
+    def stream():
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        if fmt == "csv":
+            w.writerow(["Name", "Email", "Message", "Received", "Tenant"])
+        for lead, cursor in iter_leads(start, end):
+            if not keep(lead):
+                continue
+            if fmt == "csv":
+                w.writerow([lead["name"], lead["email"], lead["message"], lead["received"] or "", lead["tenant"]])
+            else:
+                buf.write(json.dumps(dict(lead, cursor=cursor), ensure_ascii=False) + "\n")
+            if buf.tell() >= 65536:
+                yield buf.getvalue(); buf.seek(0); buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream(), mimetype=mimetype,
+                    headers={"X-Lead-Cursor": str(end), "Cache-Control": "no-store"})
+
+@route("/admin/purge", methods=["GET", "POST"])
+def admin_purge():
+    if not admin_authorized():
+        return admin_denied()
+    site = tenant()
+    if request.method == "POST":
+        body = request.get_json(silent=True)
+        keys = body.get("keys") if isinstance(body, dict) else body
+        if keys is not None and not (isinstance(keys, list) and all(isinstance(k, str) for k in keys)):
+            return Response("keys must be a list of strings", status=400, mimetype="text/plain")
+        purged = emit_purge(site, keys, reason="manual") if keys is not None else publish_content()
+        return Response(json.dumps({"purged": purged}), mimetype="application/json")
+    body = {"tenant": site.name, "versions": site.content_versions, "recent": list(PURGE_LOG)}
+    return Response(json.dumps(body, indent=2), mimetype="application/json")
+
+@route("/admin/analytics", methods=["GET"])
+def admin_analytics():
+    if not admin_authorized():
+        return admin_denied()
+    day = request.args.get("day") or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    try:
+        datetime.strptime(day, "%Y-%m-%d")
+    except ValueError:
+        return Response("day must be YYYY-MM-DD", status=400, mimetype="text/plain")
+    flush_analytics()
+    site = tenant()
+    body = {"tenant": site.name, "day": day, "counts": read_analytics(site.name, day)}
+    return Response(json.dumps(body, indent=2), mimetype="application/json", headers={"Cache-Control": "no-store"})
+
+@route("/admin/metrics", methods=["GET"])
+def admin_metrics():
+    if not admin_authorized():
+        return admin_denied()
+    with _METRICS_LOCK:
+        body = dict(METRICS, pid=os.getpid())
+    body["leads"] = LEADS.snapshot()
+    body["admission"] = {name: gate.snapshot() for name, gate in ADMISSION.items()}
+    return Response(json.dumps(body), mimetype="application/json", headers={"Cache-Control": "no-store"})
+
+@route("/healthz", methods=["GET"])
+def healthz():
+    return Response("ok", mimetype="text/plain", headers={"Cache-Control": "no-store"})
+
+@route("/readyz", methods=["GET"])
+def readyz():
+    if not READY.is_set():
+        return Response("warming up", status=503, mimetype="text/plain",
+                        headers={"Retry-After": "1", "Cache-Control": "no-store"})
+    return Response("ready", mimetype="text/plain", headers={"Cache-Control": "no-store"})
+
+# -------------------
+# Warmup: pre-stat assets and pre-render every route into the page cache before
+# /readyz reports ready. Pages are keyed by tenant, whatever Host they are requested
+# under; their share links use the tenant's base_url, so set GOPARTNERR_BASE_URL to
+# the public origin.
+# -------------------
+WARMUP = "background"
+BASE_URL = "http://localhost/"
+READY = threading.Event()
+
+def warmup(app):
+    started = time.perf_counter()
+    pages = assets = 0
+    for site in TENANTS.values():
+        for entry in site.assets.values():
+            try:
+                os.stat(entry["path"])
+            except OSError:
+                pass
+        routes = site_routes(site)
+        for path, build, args in routes:
+            try:
+                with app.test_request_context(path, base_url=site.base_url):
+                    render_page(build, *args)
+            except Exception as e:
+                print(f"[warmup] {site.name} {path} failed: {e}", file=sys.stderr)
+        pages += len(routes)
+        assets += len(site.assets)
+        for name, found in sorted(site.bad_refs.items()):
+            print(f"[assets] {site.name}: {name} " + (f"resolved as {found}" if found else "is missing"), file=sys.stderr)
+    READY.set()
+    print(f"[warmup] {len(TENANTS)} sites, {pages} pages, {assets} assets in {(time.perf_counter() - started) * 1000:.0f} ms", file=sys.stderr)
+
+# -------------------
+# Page-weight budgets: `flask --app app page-weight` renders every route, resolves
+# every referenced asset from the static dir and fails when a page is over budget.
+# Budgets are compressed transfer bytes; override them with a JSON file shaped like
+# {"default": {"total": ...}, "routes": {"/": {"image": ...}}}.
+# -------------------
+DEFAULT_BUDGETS = {"total": 1_500_000, "html": 100_000, "image": 1_000_000, "video": 5_000_000,
+                   "font": 200_000, "script": 150_000, "style": 100_000}
+ASSET_TYPES = {
+    ".png": "image", ".jpg": "image", ".jpeg": "image", ".gif": "image", ".webp": "image", ".avif": "image", ".svg": "image",
+    ".mp4": "video", ".mov": "video", ".webm": "video",
+    ".woff": "font", ".woff2": "font", ".ttf": "font", ".otf": "font",
+    ".js": "script", ".css": "style",
+}
+TEXT_TYPES = {"html", "script", "style"}
+_REF_PATTERNS = [
+    re.compile(r"""\b(?:src|poster|href)\s*=\s*["']([^"']+)["']""", re.I),
+    re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)""", re.I),
+    re.compile(r"""\bsrcset\s*=\s*["']([^"']+)["']""", re.I),
+]
+
+def page_references(html):
+    refs = set()
+    for pattern in _REF_PATTERNS:
+        for m in pattern.finditer(html):
+            value = m.group(1)
+            candidates = [c.strip().split(" ")[0] for c in value.split(",")] if "srcset" in m.group(0).lower() else [value]
+            refs.update(c for c in candidates if c.startswith(("/static/", "/assets/", "http://", "https://")))
+    return refs
+
+def resolve_asset(site, url):
+    # Returns (name, path or None) for local static URLs, None for external URLs
+    path = urlsplit(url).path
+    if path.startswith("/assets/"):
+        name = path.split("/", 3)[3] if path.count("/") >= 3 else ""
+    elif path.startswith("/static/"):
+        name = path[len("/static/"):]
+    else:
+        return None
+    entry = site.assets.get(name)
+    if entry:
+        return name, entry["path"]
+    while site is not None:
+        candidate = os.path.join(site.static_dir, name)
+        if os.path.isfile(candidate):
+            return name, candidate
+        site = site.fallback
+    return name, None
+
+_TRANSFER_SIZES = {}
+
+def transfer_size(path, kind):
+    # Media is already compressed and served as-is; only text types are gzipped
+    key = (path, kind)
+    if key not in _TRANSFER_SIZES:
+        with open(path, "rb") as f:
+            data = f.read()
+        _TRANSFER_SIZES[key] = (len(data), len(gzip.compress(data, 6)) if kind in TEXT_TYPES else len(data))
+    return _TRANSFER_SIZES[key]
+
+def page_weight(client, site, path):
+    resp = client.get(path, base_url=site.base_url)
+    html = resp.get_data(as_text=True)
+    raw = {"html": len(resp.data)}
+    compressed = {"html": len(gzip.compress(resp.data, 6))}
+    missing, external = [], []
+    for url in sorted(page_references(html)):
+        if url.startswith(("http://", "https://")) and not url.startswith(site.base_url):
+            external.append(url)
+            continue
+        resolved = resolve_asset(site, url)
+        if resolved is None:
+            continue
+        name, file_path = resolved
+        if file_path is None:
+            missing.append(url)
+            continue
+        kind = ASSET_TYPES.get(os.path.splitext(name.lower())[1], "other")
+        r, c = transfer_size(file_path, kind)
+        raw[kind] = raw.get(kind, 0) + r
+        compressed[kind] = compressed.get(kind, 0) + c
+    raw["total"] = sum(raw.values())
+    compressed["total"] = sum(compressed.values())
+    return {"path": path, "status": resp.status_code, "raw": raw, "compressed": compressed,
+            "missing": missing, "external": external}
+
+def load_budgets(path):
+    if not path:
+        return {"default": DEFAULT_BUDGETS, "routes": {}}
+    with open(path, encoding="utf-8") as f:
+        cfg = json.load(f)
+    return {"default": dict(DEFAULT_BUDGETS, **cfg.get("default", {})), "routes": cfg.get("routes", {})}
+
+@command
+@click.command("page-weight")
+@click.option("--budgets", "budgets_path", default=lambda: os.environ.get("GOPARTNERR_BUDGETS"),
+              help="JSON budget file (default: GOPARTNERR_BUDGETS or built-in budgets)")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+@click.option("--tenant", "tenant_name", default=DEFAULT_TENANT, help="Tenant to analyze (default: the default site)")
+@with_appcontext
+def page_weight_command(budgets_path, as_json, tenant_name):
+    """Report transfer bytes per page and fail on budget overruns."""
+    if tenant_name not in TENANTS:
+        raise click.BadParameter(f"unknown tenant {tenant_name!r}", param_hint="--tenant")
+    site = TENANTS[tenant_name]
+    budgets = load_budgets(budgets_path)
+    client = internal_client(current_app)
+    report, overruns = [], []
+    for path, _, _ in site_routes(site):
+        page = page_weight(client, site, path)
+        limits = dict(budgets["default"], **budgets["routes"].get(path, {}))
+        page["over"] = {k: (page["compressed"].get(k, 0), limit) for k, limit in limits.items()
+                        if page["compressed"].get(k, 0) > limit}
+        overruns += [(path, k, v, limit) for k, (v, limit) in page["over"].items()]
+        report.append(page)
+    if as_json:
+        click.echo(json.dumps({"pages": report, "budgets": budgets}, indent=2))
+    else:
+        kinds = ["html", "image", "video", "font", "script", "style", "other"]
+        click.echo(f"{'page':<44}" + "".join(f"{k:>10}" for k in kinds) + f"{'total':>11}{'raw':>11}  status")
+        for page in report:
+            c = page["compressed"]
+            click.echo(f"{page['path'][:43]:<44}" + "".join(f"{c.get(k, 0) // 1024:>9}K" for k in kinds)
+                       + f"{c['total'] // 1024:>10}K{page['raw']['total'] // 1024:>10}K  "
+                       + ("OVER" if page["over"] else "ok"))
+            for url in page["missing"]:
+                click.echo(f"    missing asset: {url}")
+        for path, kind, value, limit in overruns:
+            click.echo(f"OVER BUDGET {path}: {kind} {value:,} B > {limit:,} B")
+    if overruns:
+        raise SystemExit(1)
+
+# -------------------
+# Asset references: `flask --app app check-assets` renders every route with the
+# builders themselves (not from the page cache), so every static file they ask
+# for goes through find_asset, including /static/ links inside service long_copy
+# and article bodies, and then lists the ones that are missing or only exist with
+# different case. Pages already drop or substitute those; this is the list of
+# files (or references) to fix.
+# -------------------
+@command
+@click.command("check-assets")
+@click.option("--tenant", "tenant_name", default=None, help="Tenant to check (default: all)")
+@click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+@with_appcontext
+def check_assets_command(tenant_name, as_json):
+    """Report referenced static files that are missing or differ in case."""
+    if tenant_name is not None and tenant_name not in TENANTS:
+        raise click.BadParameter(f"unknown tenant {tenant_name!r}", param_hint="--tenant")
+    problems = []
+    for site in [TENANTS[tenant_name]] if tenant_name else TENANTS.values():
+        site.css = None    # recompile so the stylesheet's references are checked too
+        unresolved = {}
+        for path, build, args in site_routes(site):
+            with current_app.test_request_context(path, base_url=site.base_url):
+                html = build(*args)
+            for url in page_references(html):
+                resolved = resolve_asset(site, url)
+                if resolved and resolved[1] is None:
+                    unresolved.setdefault(resolved[0], path)
+        refs = dict(site.bad_refs)
+        for name in unresolved:
+            refs.setdefault(name, None)
+        for name, found in sorted(refs.items()):
+            problems.append({"tenant": site.name, "reference": name, "found": found,
+                             "problem": "case" if found else "missing", "page": unresolved.get(name)})
+    if as_json:
+        click.echo(json.dumps(problems, indent=2))
+    else:
+        for p in problems:
+            where = f" (still referenced by {p['page']})" if p["page"] else ""
+            fix = f"exists as {p['found']}" if p["found"] else "no such file"
+            click.echo(f"{p['tenant']:<12} {p['problem']:<8} {p['reference']:<32} {fix}{where}")
+        click.echo(f"{len(problems)} problem(s)" if problems else "all referenced assets exist")
+    if problems:
+        raise SystemExit(1)
+
+# -------------------
+# Site bundle: `flask --app app build-bundle -o site.bundle` requests every page,
+# /sw.js and every static asset of every tenant through the app and packs the
+# responses (plus gzip variants of text) into one content-addressed file:
+#   "GPBNDL01" | index offset, index length (uint64 BE) | blobs ... | JSON index
+# With GOPARTNERR_BUNDLE=site.bundle a WSGI middleware maps the file and answers
+# GET/HEAD for those URLs straight from the mapping; everything else (posts, API,
+# admin, Range requests) falls through to the app. Replacing the file (rename) is
+# picked up within a second, so a deploy is one atomic swap. There is no render
+# warmup in bundle mode: /readyz is 200 as soon as the file is mapped. Pages embed
+# absolute share links, so build with GOPARTNERR_BASE_URL (and tenant base_url) set
+# to the public origins.
+# -------------------
+BUNDLE_MAGIC = b"GPBNDL01"
+BUNDLE_HEADER = struct.Struct(">8sQQ")
+BUNDLE_GZIP_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+BUNDLE_SKIP_HEADERS = {"content-length", "date", "set-cookie", "content-encoding"}
+
+def bundle_urls(site):
+    urls = [path for path, _, _ in site_routes(site)] + ["/sw.js"]
+    for name in sorted(site.assets):
+        urls += [static_url(name), f"/static/{name}"]
+    return urls
+
+def write_bundle(output, responses):
+    # responses: (tenant, path, status, headers, body, view). Blobs are stored once per sha256.
+    index = {"built": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+             "hosts": {h: name for name, site in TENANTS.items() for h in site.hosts},
+             "default": DEFAULT_TENANT, "routes": {}}
+    folder = os.path.dirname(os.path.abspath(output))
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-bundle-")
+    blobs = {}
+    with os.fdopen(fd, "wb") as f:
+        f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, 0, 0))
+
+        def blob(data):
+            key = hashlib.sha256(data).hexdigest()
+            if key not in blobs:
+                blobs[key] = [f.tell(), len(data)]
+                f.write(data)
+            return blobs[key]
+
+        for name, path, status, headers, body, view in responses:
+            ctype = dict(headers).get("Content-Type", "")
+            entry = {"status": status, "headers": headers, "body": blob(body), "view": view}
+            if len(body) > 1024 and ctype.startswith(BUNDLE_GZIP_TYPES):
+                entry["gzip"] = blob(gzip.compress(body, 9, mtime=0))
+            index["routes"].setdefault(name, {})[path] = entry
+        raw = json.dumps(index, separators=(",", ":")).encode("utf-8")
+        offset = f.tell()
+        f.write(raw)
+        f.seek(0)
+        f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, offset, len(raw)))
+        os.fchmod(f.fileno(), 0o644)    # mkstemp's 0600 would keep a server running as another user out
+    os.replace(tmp, output)
+    return index, sum(n for _, n in blobs.values())
+
+@command
+@click.command("build-bundle")
+@click.option("--output", "-o", default="site.bundle", show_default=True, help="Bundle file to write")
+@with_appcontext
+def build_bundle_command(output):
+    """Pack every page, its gzip variant and every static asset into one bundle file."""
+    client = internal_client(current_app)
+    adapter = current_app.url_map.bind("localhost")
+
+    def responses():
+        for site in TENANTS.values():
+            with current_app.test_request_context("/", base_url=site.base_url):
+                urls = bundle_urls(site)
+            for path in urls:
+                resp = client.get(path, base_url=site.base_url)
+                if resp.status_code != 200:
+                    click.echo(f"skipped {site.name} {path}: {resp.status_code}", err=True)
+                    continue
+                endpoint, args = adapter.match(path)
+                view = [endpoint, args.get("slug")] if endpoint in PAGE_ENDPOINTS else None
+                headers = [[k, v] for k, v in resp.headers.items() if k.lower() not in BUNDLE_SKIP_HEADERS]
+                yield site.name, path, resp.status_code, headers, resp.get_data(), view
+
+    index, size = write_bundle(output, responses())
+    routes = sum(len(r) for r in index["routes"].values())
+    click.echo(f"{output}: {routes} responses from {len(index['routes'])} site(s), {size:,} bytes of unique content")
+
+class BundleMiddleware:
+    def __init__(self, app, path):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.path = path
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.stamp = None
+        self.current = None   # (index, memoryview of the mapping), swapped as one
+        self.reload()
+
+    def reload(self):
+        st = os.stat(self.path)
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self.stamp:
+            return
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, offset, length = BUNDLE_HEADER.unpack_from(mm)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{self.path} is not a site bundle")
+        view = memoryview(mm)
+        index = json.loads(bytes(view[offset:offset + length]))
+        self.current, self.stamp = (index, view), stamp
+        print(f"[bundle] serving {self.path} built {index['built']}", file=sys.stderr)
+
+    def lookup(self, environ):
+        now = time.monotonic()
+        if now - self.checked > 1.0:
+            with self.lock:
+                if now - self.checked > 1.0:
+                    self.checked = now
+                    try:
+                        self.reload()
+                    except (OSError, ValueError, struct.error) as e:
+                        print(f"[bundle] keeping current bundle: {e}", file=sys.stderr)
+        index, view = self.current
+        host = environ.get("HTTP_HOST", "").lower()
+        name = index["hosts"].get(host) or index["hosts"].get(host.rsplit(":", 1)[0]) or index["default"]
+        return name, index["routes"].get(name, {}).get(environ.get("PATH_INFO", "")), view
+
+    def __call__(self, environ, start_response):
+        entry = view = None
+        if environ["REQUEST_METHOD"] in ("GET", "HEAD") and not ("HTTP_RANGE" in environ or "HTTP_X_FRAGMENT" in environ):
+            name, entry, view = self.lookup(environ)
+        if entry is None:
+            return self.wsgi_app(environ, start_response)
+        start_background(self.app)
+        headers = [tuple(h) for h in entry["headers"]]
+        etag = dict(headers).get("ETag", "").strip('"')
+        if entry["view"] and environ["REQUEST_METHOD"] == "GET" and not speculative(environ):
+            endpoint, slug = entry["view"]
+            record(name, "view", endpoint)
+            if slug:
+                record(name, "slug", f"{endpoint}:{slug}")
+            record(name, "ref", referrer_class(environ.get("HTTP_REFERER"), environ.get("HTTP_HOST", "")))
+        offset, length = entry["body"]
+        if "gzip" in entry:
+            headers.append(("Vary", "Accept-Encoding"))
+            if parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING"))["gzip"] > 0:
+                offset, length = entry["gzip"]
+                headers.append(("Content-Encoding", "gzip"))
+                if etag:    # each encoding is a different representation
+                    etag += "-gz"
+                    headers = [("ETag", f'"{etag}"') if k == "ETag" else (k, v) for k, v in headers]
+        if etag and parse_etags(environ.get("HTTP_IF_NONE_MATCH")).contains_weak(etag):
+            start_response("304 Not Modified", [h for h in headers if h[0] not in ("Content-Type", "Content-Encoding")])
+            return []
+        headers.append(("Content-Length", str(length)))
+        start_response(f"{entry['status']} OK", headers)
+        if environ["REQUEST_METHOD"] == "HEAD":
+            return []
+        # WSGI servers only accept bytes, so the slice is copied once on the way out
+        return [view[offset:offset + length].tobytes()]
+
+# -------------------
+# App factory. Call create_app() once per process (in the master when the server
+# preloads); its scans are inherited by forked workers. Threads don't survive a
+# fork, so each process starts its background work, and publishes content versions
+# (the first to see a change purges the CDN), on its first request. The
+# module-level `app` (flask --app app, gunicorn app:app) is built on first access.
+# -------------------
+_BACKGROUND_PID = None
+_BACKGROUND_LOCK = threading.Lock()
+
+def configure(config):
+    global STATIC_DIR, CACHE_DIR, ANALYTICS_DIR, LEADS, LEADS_CSV, ADMIN_TOKEN, BASE_URL, WARMUP, TENANTS, _TENANT_HOSTS
+    global ADMISSION
+    globals().update((name, config[name]) for name in SETTINGS)
+    ADMISSION = {} if config["ADMISSION"] == "0" else parse_admission(config["ADMISSION"])
+    STATIC_DIR = config["STATIC_DIR"]
+    CACHE_DIR = config["CACHE_DIR"]
+    ANALYTICS_DIR = config["ANALYTICS_DIR"] or os.path.join(CACHE_DIR, "analytics")
+    LEADS_CSV = config["LEADS_CSV"]
+    LEADS = LeadOutbox(os.path.join(CACHE_DIR, "lead-outbox.jsonl"), lead_sinks())
+    ADMIN_TOKEN = config["ADMIN_TOKEN"]
+    BASE_URL = config["BASE_URL"]
+    WARMUP = config["WARMUP"]
+    default = Tenant(DEFAULT_TENANT, {"static_dir": STATIC_DIR}, CACHE_DIR)
+    tenants, hosts = {DEFAULT_TENANT: default}, {}
+    for name, entry in (load_tenants(config["TENANTS"]) if config["TENANTS"] else {}).items():
+        site = Tenant(name, entry, os.path.join(CACHE_DIR, "tenants", name), fallback=default)
+        for host in site.hosts:
+            if host in hosts:
+                raise ValueError(f"host {host} is claimed by tenants {hosts[host].name!r} and {name!r}")
+            hosts[host] = site
+        tenants[name] = site
+    TENANTS, _TENANT_HOSTS = tenants, hosts
+
+def load_site():
+    global APP_SOURCE_DIGEST
+    with open(os.path.abspath(__file__), "rb") as f:
+        APP_SOURCE_DIGEST = hashlib.sha256(f.read()).hexdigest()[:16]
+    for site in TENANTS.values():    # default first: the others overlay its assets
+        site.load()
+        if not os.path.isdir(site.static_dir):
+            print(f"[{site.name}] static_dir {site.static_dir} does not exist: set GOPARTNERR_STATIC_DIR "
+                  "(or the tenant's static_dir)", file=sys.stderr)
+        if urlsplit(site.base_url).hostname in ("localhost", "127.0.0.1"):
+            print(f"[{site.name}] base_url is {site.base_url}: share links will point there; "
+                  "set GOPARTNERR_BASE_URL (or the tenant's base_url) to the public origin", file=sys.stderr)
+    for site in TENANTS.values():
+        prepare_tenant(site)
+
+def start_background(app):
+    global _BACKGROUND_PID
+    if _BACKGROUND_PID == os.getpid():
+        return
+    with _BACKGROUND_LOCK:
+        if _BACKGROUND_PID == os.getpid():
+            return
+        _BACKGROUND_PID = os.getpid()
+        publish_content()    # only serving processes get here: CLI and internal-client runs never purge
+    threading.Thread(target=_analytics_flusher, name="analytics-flush", daemon=True).start()
+    threading.Thread(target=LEADS.run, name="lead-dispatch", daemon=True).start()
+    atexit.register(flush_analytics)
+    if not READY.is_set():
+        threading.Thread(target=warmup, args=(app,), name="warmup", daemon=True).start()
+
+def _start_background():
+    if "gopartnerr.internal" in request.environ:
+        return
+    start_background(current_app._get_current_object())
+
+def create_app(config=None):
+    config = dict(default_config(), **(config or {}))
+    configure(config)
+    app = Flask(__name__, static_folder=None)
+    app.config.update(config)
+    app.before_request(_start_background)
+    for rule, view, options in _ROUTES:
+        app.add_url_rule(rule, view_func=view, **options)
+    for kind, fn in _HOOKS:
+        getattr(app, kind)(fn)
+    for cmd in _COMMANDS:
+        app.cli.add_command(cmd)
+    if config["PROFILING"]:
+        install_profiling(app)
+    if config["BUNDLE"]:
+        app.wsgi_app = BundleMiddleware(app, config["BUNDLE"])
+    load_site()
+    if config["DIAGNOSTICS"]:
+        print_diagnostics()
+    READY.clear()
+    if WARMUP == "0" or config["BUNDLE"]:    # bundled pages are served from the file, not rendered
+        READY.set()
+    elif WARMUP == "sync":
+        warmup(app)
+    return app
+
+_APP = None
+_APP_LOCK = threading.Lock()
+
+def __getattr__(name):
+    global _APP
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _APP_LOCK:
+        if _APP is None:
+            _APP = create_app()
+    return _APP
 
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5114, debug=False)
+    create_app({"DIAGNOSTICS": True}).run(host=os.environ.get("GOPARTNERR_HOST", "127.0.0.1"),
+            port=int(os.environ.get("GOPARTNERR_PORT", "5114")), debug=False, threaded=True)
@@ -0,0 +1,437 @@
+# loadtest.py
+# End-to-end load test: starts app.py with a local fake SMTP relay and a fake CRM
+# webhook, drives a mix of page GETs and /contact POSTs at a target rate, waits for
+# the lead dispatcher to drain, then checks leads.csv and webhook integrity.
+#
+#   python loadtest.py --rate 50 --duration 30 --contact-share 0.1 --smtp-latency 2
+import argparse
+import csv
+import http.client
+import http.server
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# -------------------
+# Fake SMTP relay (plain text, AUTH accepted, optional latency/failures). Tests
+# script it: auth_reply answers AUTH, rcpt_reply answers RCPT, replies are used for
+# DATA before fail_rate.
+# -------------------
+class FakeSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0, fail_rate=0.0, auth_reply="235 2.7.0 Authentication successful", replies=(),
+                 rcpt_reply="250 OK"):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.auth_reply = auth_reply
+        self.rcpt_reply = rcpt_reply
+        self.replies = list(replies)
+        self.lock = threading.Lock()
+        self.delivered = []
+        self.rejected = 0
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        srv = self.server
+        self.reply("220 fake-smtp ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode("utf-8", "replace").strip().upper()
+            if cmd.startswith(("EHLO", "HELO")):
+                self.wfile.write(b"250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif cmd.startswith("AUTH"):
+                self.reply(srv.auth_reply)
+            elif cmd.startswith("RCPT"):
+                self.reply(srv.rcpt_reply)
+            elif cmd.startswith(("MAIL", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif cmd == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                body = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b".\r\n", b".\n"):
+                        break
+                    body.append(chunk)
+                if srv.latency:
+                    time.sleep(srv.latency)
+                with srv.lock:
+                    scripted = srv.replies.pop(0) if srv.replies else None
+                if scripted and not scripted.startswith("250"):
+                    with srv.lock:
+                        srv.rejected += 1
+                    self.reply(scripted)
+                elif not scripted and random.random() < srv.fail_rate:
+                    with srv.lock:
+                        srv.rejected += 1
+                    self.reply("451 4.3.0 Injected failure")
+                else:
+                    with srv.lock:
+                        srv.delivered.append(b"".join(body).decode("utf-8", "replace"))
+                    self.reply("250 OK queued")
+            elif cmd == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+# -------------------
+# Fake CRM webhook (records the leads it accepts, optional latency/failures).
+# Tests script it: statuses answer the first batches, batches carrying a lead whose
+# email is in refuse get a 422.
+# -------------------
+class FakeWebhook(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, fail_rate=0.0, statuses=(), refuse=()):
+        super().__init__(("127.0.0.1", 0), WebhookHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.statuses = list(statuses)
+        self.refuse = set(refuse)
+        self.lock = threading.Lock()
+        self.leads = []
+        self.batches = 0
+        self.rejected = 0
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        srv = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        if srv.latency:
+            time.sleep(srv.latency)
+        leads = json.loads(body)["leads"]
+        with srv.lock:
+            status = srv.statuses.pop(0) if srv.statuses else None
+        if status is None and any(lead.get("email") in srv.refuse for lead in leads):
+            status = 422
+        if status is None and random.random() < srv.fail_rate:
+            status = 503
+        if status is not None and status >= 300:
+            with srv.lock:
+                srv.rejected += 1
+            self.send_response(status)
+        else:
+            with srv.lock:
+                srv.leads.extend(leads)
+                srv.batches += 1
+            self.send_response(status or 204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+# -------------------
+# App process
+# -------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_app(port, smtp_port, webhook_port, workdir, token):
+    env = dict(os.environ,
+               GOPARTNERR_HOST="127.0.0.1", GOPARTNERR_PORT=str(port),
+               GOPARTNERR_SMTP_HOST="127.0.0.1", GOPARTNERR_SMTP_PORT=str(smtp_port),
+               GOPARTNERR_SMTP_USER="loadtest@example.com", GOPARTNERR_SMTP_PASS="loadtest",
+               GOPARTNERR_SMTP_STARTTLS="0",
+               GOPARTNERR_LEAD_WEBHOOK=f"http://127.0.0.1:{webhook_port}/leads",
+               GOPARTNERR_LEADS_CSV=os.path.join(workdir, "leads.csv"),
+               GOPARTNERR_CACHE_DIR=os.path.join(workdir, "cache"),
+               GOPARTNERR_ADMIN_TOKEN=token)
+    with open(os.path.join(workdir, "app.log"), "wb") as log:    # the child keeps its own copy
+        proc = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, "app.py")], env=env,
+                                stdout=log, stderr=subprocess.STDOUT, cwd=workdir)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"app exited during startup, see {log.name}")
+        try:
+            if request("127.0.0.1", port, "GET", "/readyz")[0] == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("app did not become ready within 30s")
+
+def request(host, port, method, path, body=None, headers=None, timeout=30):
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        data = resp.read()
+        return resp.status, data
+    finally:
+        conn.close()
+
+def discover_routes(port):
+    routes = {"/", "/articles", "/sw.js"}
+    assets = set()
+    for page in ("/", "/articles"):
+        _, html = request("127.0.0.1", port, "GET", page)
+        html = html.decode("utf-8", "replace")
+        routes.update(re.findall(r'href="(/(?:services|articles)/[^"#?]+)"', html))
+        assets.update(re.findall(r'(?:src|poster)="(/(?:assets|static)/[^"]+)"', html))
+    return sorted(routes), sorted(assets)
+
+# -------------------
+# Load generation (open loop: latency is measured from the scheduled send time)
+# -------------------
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+def run_load(port, routes, assets, args, run_id):
+    jobs = queue.Queue()
+    results = []
+    results_lock = threading.Lock()
+    busy = [0]
+    saturated = [0]
+    counter = [0]
+
+    def pick():
+        r = random.random()
+        if r < args.contact_share:
+            counter[0] += 1
+            return ("contact", f"{run_id}-{counter[0]}")
+        if assets and r < args.contact_share + args.asset_share:
+            return ("asset", random.choice(assets))
+        return ("page", random.choice(routes))
+
+    def worker():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            scheduled, (kind, target) = job
+            with results_lock:
+                busy[0] += 1
+            started = time.perf_counter()
+            status, error = None, None
+            try:
+                if kind == "contact":
+                    form = urllib.parse.urlencode({"name": "Load Test", "email": f"{target}@loadtest.invalid",
+                                                   "message": f"marker {target}"})
+                    status, _ = request("127.0.0.1", port, "POST", "/contact", body=form,
+                                        headers={"Content-Type": "application/x-www-form-urlencoded"},
+                                        timeout=args.timeout)
+                else:
+                    status, _ = request("127.0.0.1", port, "GET", target, timeout=args.timeout)
+            except Exception as e:
+                error = type(e).__name__
+            done = time.perf_counter()
+            with results_lock:
+                busy[0] -= 1
+                results.append({"kind": kind, "target": target, "status": status, "error": error,
+                                "latency": done - scheduled, "service": done - started})
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+
+    interval = 1.0 / args.rate
+    start = time.perf_counter()
+    n = 0
+    while True:
+        scheduled = start + n * interval
+        if scheduled - start >= args.duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        with results_lock:
+            if busy[0] >= args.concurrency:
+                saturated[0] += 1
+        jobs.put((scheduled, pick()))
+        n += 1
+    for _ in threads:
+        jobs.put(None)
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return results, elapsed, saturated[0] / max(1, n)
+
+def poll_metrics(port, token, stop, samples):
+    while not stop.is_set():
+        try:
+            status, data = request("127.0.0.1", port, "GET", "/admin/metrics",
+                                   headers={"Authorization": f"Bearer {token}"}, timeout=5)
+            if status == 200:
+                samples.append(json.loads(data))
+        except Exception:
+            pass
+        stop.wait(0.25)
+
+def wait_for_leads(port, token, timeout):
+    # Leads are acknowledged once they are in the outbox; wait until every sink has them
+    deadline = time.time() + timeout
+    pending = None
+    while time.time() < deadline:
+        try:
+            status, data = request("127.0.0.1", port, "GET", "/admin/metrics",
+                                   headers={"Authorization": f"Bearer {token}"}, timeout=5)
+            if status == 200:
+                pending = {name: s["pending"] for name, s in json.loads(data)["leads"]["sinks"].items()}
+                if not any(pending.values()):
+                    return pending
+        except Exception:
+            pass
+        time.sleep(0.25)
+    return pending
+
+# -------------------
+# Integrity + report
+# -------------------
+def check_webhook(webhook, run_id, results):
+    sent = {r["target"] for r in results if r["kind"] == "contact" and r["status"] == 200}
+    seen = {}
+    for lead in webhook.leads:
+        m = re.search(r"marker (\S+)", lead.get("message", ""))
+        if m and m.group(1).startswith(run_id):
+            seen.setdefault(m.group(1), []).append(lead["id"])
+    # At-least-once: a batch retried after a lost response repeats ids, which a CRM drops
+    return {"stored": len(seen), "missing": len(sent - set(seen)), "batches": webhook.batches,
+            "rejected": webhook.rejected, "redelivered": sum(len(ids) - len(set(ids)) for ids in seen.values())}
+
+def check_leads(path, run_id, results):
+    sent = {r["target"] for r in results if r["kind"] == "contact" and r["status"] == 200}
+    seen, dupes, bad_rows = {}, 0, 0
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if len(row) < 3:
+                    bad_rows += 1
+                    continue
+                m = re.search(r"marker (\S+)", row[2])
+                if m and m.group(1).startswith(run_id):
+                    seen[m.group(1)] = seen.get(m.group(1), 0) + 1
+    except OSError:
+        pass
+    except csv.Error:
+        bad_rows += 1
+    dupes = sum(c - 1 for c in seen.values() if c > 1)
+    return {"acknowledged": len(sent), "stored": len(seen), "missing": len(sent - set(seen)),
+            "duplicates": dupes, "malformed_rows": bad_rows}
+
+def summarize(results, elapsed):
+    out = {}
+    for kind in sorted({r["kind"] for r in results}) + ["all"]:
+        rs = [r for r in results if kind == "all" or r["kind"] == kind]
+        ok = [r for r in rs if r["error"] is None and r["status"] is not None and r["status"] < 400]
+        lat = [r["latency"] * 1000 for r in ok]
+        out[kind] = {
+            "requests": len(rs), "throughput_rps": round(len(ok) / elapsed, 1),
+            "error_rate": round(1 - len(ok) / len(rs), 4) if rs else 0.0,
+            "p50_ms": percentile(lat, 50), "p90_ms": percentile(lat, 90),
+            "p99_ms": percentile(lat, 99), "max_ms": max(lat) if lat else None,
+        }
+        for key in ("p50_ms", "p90_ms", "p99_ms", "max_ms"):
+            if out[kind][key] is not None:
+                out[kind][key] = round(out[kind][key], 1)
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Concurrent load test for app.py")
+    ap.add_argument("--rate", type=float, default=20.0, help="target requests per second")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    ap.add_argument("--concurrency", type=int, default=32, help="client threads")
+    ap.add_argument("--contact-share", type=float, default=0.05, help="fraction of requests that POST /contact")
+    ap.add_argument("--asset-share", type=float, default=0.2, help="fraction of requests for static assets")
+    ap.add_argument("--smtp-latency", type=float, default=0.0, help="seconds the fake relay stalls per message")
+    ap.add_argument("--smtp-fail-rate", type=float, default=0.0, help="fraction of messages the relay rejects")
+    ap.add_argument("--webhook-latency", type=float, default=0.0, help="seconds the fake webhook stalls per batch")
+    ap.add_argument("--webhook-fail-rate", type=float, default=0.0, help="fraction of batches the webhook rejects")
+    ap.add_argument("--drain-timeout", type=float, default=60.0, help="seconds to wait for queued leads to reach every sink")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--keep", action="store_true", help="keep the temporary work directory")
+    args = ap.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="gp-loadtest-")
+    token = secrets.token_hex(16)
+    run_id = "lt" + secrets.token_hex(4)
+    smtp = FakeSMTP(args.smtp_latency, args.smtp_fail_rate)
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+    webhook = FakeWebhook(args.webhook_latency, args.webhook_fail_rate)
+    threading.Thread(target=webhook.serve_forever, daemon=True).start()
+    port = free_port()
+    proc = start_app(port, smtp.server_address[1], webhook.server_address[1], workdir, token)
+    try:
+        routes, assets = discover_routes(port)
+        stop, samples = threading.Event(), []
+        poller = threading.Thread(target=poll_metrics, args=(port, token, stop, samples), daemon=True)
+        poller.start()
+        results, elapsed, client_saturation = run_load(port, routes, assets, args, run_id)
+        stop.set()
+        poller.join()
+        undelivered = wait_for_leads(port, token, args.drain_timeout)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+        smtp.shutdown()
+        webhook.shutdown()
+
+    inflight = [s["inflight"] for s in samples]
+    report = {
+        "config": vars(args), "routes": len(routes), "assets": len(assets), "elapsed_s": round(elapsed, 2),
+        "latency": summarize(results, elapsed),
+        "server": {
+            "inflight_peak": max((s["peak_inflight"] for s in samples), default=None),
+            "inflight_mean": round(sum(inflight) / len(inflight), 2) if inflight else None,
+        },
+        "client_saturation": round(client_saturation, 4),
+        "smtp": {"delivered": sum(1 for m in smtp.delivered if run_id in m), "rejected": smtp.rejected},
+        "leads": check_leads(os.path.join(workdir, "leads.csv"), run_id, results),
+        "webhook": check_webhook(webhook, run_id, results),
+        "undelivered": undelivered,
+        "workdir": workdir if args.keep else None,
+    }
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"\n=== Load test: {args.rate:g} rps x {args.duration:g}s, {len(routes)} routes, {len(assets)} assets ===")
+        print(f"{'class':<8} {'reqs':>6} {'rps':>7} {'err%':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+        for kind, st in report["latency"].items():
+            print(f"{kind:<8} {st['requests']:>6} {st['throughput_rps']:>7} {st['error_rate'] * 100:>6.2f}"
+                  + "".join(f" {(st[k] if st[k] is not None else '-'):>8}" for k in ("p50_ms", "p90_ms", "p99_ms", "max_ms")))
+        print(f"server in-flight: peak {report['server']['inflight_peak']}, mean {report['server']['inflight_mean']}")
+        print(f"client pool saturated on {report['client_saturation'] * 100:.1f}% of sends (raise --concurrency if high)")
+        print(f"smtp: delivered {report['smtp']['delivered']}, rejected {report['smtp']['rejected']}")
+        print("leads:", ", ".join(f"{k} {v}" for k, v in report["leads"].items()))
+        print("webhook:", ", ".join(f"{k} {v}" for k, v in report["webhook"].items()))
+        if any((undelivered or {}).values()):
+            print(f"still queued at shutdown: {undelivered}")
+    leads = report["leads"]
+    return 1 if leads["missing"] or leads["duplicates"] or leads["malformed_rows"] or report["webhook"]["missing"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+
+@pytest.fixture
+def make_app(tmp_path):
+    # create_app() against an empty static dir and a private cache, with nothing external configured
+    def make(**config):
+        (tmp_path / "static").mkdir(exist_ok=True)
+        base = {"STATIC_DIR": str(tmp_path / "static"), "CACHE_DIR": str(tmp_path / "cache"),
+                "LEADS_CSV": str(tmp_path / "leads.csv"), "ADMIN_TOKEN": "t", "WARMUP": "0", "SMTP_HOST": None,
+                "LEAD_WEBHOOK_URL": None, "PURGE_URL": None, "ADMISSION": "0", "BASE_URL": "https://example.com/"}
+        return app.create_app(dict(base, **config))
+    return make
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import app
+
+def test_full_class_is_shed_with_retry_after(make_app):
+    client = make_app(ADMISSION="page=1/0", ADMISSION_RETRY_AFTER="7").test_client()
+    gate = app.ADMISSION["page"]
+    assert gate.acquire(0)    # hold the only page slot
+    try:
+        resp = client.get("/")
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "7"
+        assert resp.headers["Cache-Control"] == "no-store"
+        resp = client.get("/api/services", headers={"Accept": "application/json"})
+        assert resp.status_code == 503
+        assert resp.get_json()["ok"] is False
+        assert client.get("/healthz").status_code == 200    # unclassified routes are never shed
+    finally:
+        gate.release()
+    assert client.get("/").status_code == 200
+    assert gate.snapshot()["shed"] == 2
+
+def test_only_the_rendering_request_takes_a_render_slot(make_app, monkeypatch):
+    client = make_app(ADMISSION="render=1/0").test_client()
+    rendering, finish = threading.Event(), threading.Event()
+    real_home = app.home_html
+    def slow_home(*args):
+        rendering.set()
+        finish.wait(5)
+        return real_home(*args)
+    monkeypatch.setattr(app, "home_html", slow_home)
+    statuses = []
+    def get():
+        statuses.append(client.get("/").status_code)
+    leader = threading.Thread(target=get)
+    leader.start()
+    assert rendering.wait(5)
+    followers = [threading.Thread(target=get) for _ in range(5)]
+    for t in followers:
+        t.start()
+    time.sleep(0.2)    # let the followers join the leader's render
+    finish.set()
+    for t in [leader] + followers:
+        t.join(5)
+    gate = app.ADMISSION["render"].snapshot()
+    assert statuses == [200] * 6
+    assert (gate["admitted"], gate["shed"], gate["active"]) == (1, 0, 0)
+
+def test_cold_render_is_shed_while_the_render_slot_is_held(make_app):
+    client = make_app(ADMISSION="render=1/0").test_client()
+    gate = app.ADMISSION["render"]
+    assert gate.acquire(0)
+    try:
+        assert client.get("/").status_code == 503
+    finally:
+        gate.release()
+    assert client.get("/").status_code == 200
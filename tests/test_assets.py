@@ -0,0 +1,27 @@
+import os
+
+import app
+
+def test_asset_digests_are_cached_by_mtime_and_size(tmp_path, monkeypatch):
+    static, cache = tmp_path / "static", str(tmp_path / "asset-digests.json")
+    (static / "css").mkdir(parents=True)
+    (static / "logo.png").write_bytes(b"logo")
+    (static / "css" / "site.css").write_bytes(b"body{}")
+    first = app.build_asset_manifest(str(static), cache)
+    assert sorted(first) == ["css/site.css", "logo.png"]
+
+    hashed = []
+    real_open = open
+    def tracking_open(path, *args, **kwargs):
+        if str(path).startswith(str(static)):
+            hashed.append(os.path.relpath(path, static))
+        return real_open(path, *args, **kwargs)
+    monkeypatch.setattr("builtins.open", tracking_open)
+    assert app.build_asset_manifest(str(static), cache) == first
+    assert hashed == []
+
+    (static / "logo.png").write_bytes(b"new logo")
+    changed = app.build_asset_manifest(str(static), cache)
+    assert hashed == ["logo.png"]
+    assert changed["logo.png"]["digest"] != first["logo.png"]["digest"]
+    assert changed["css/site.css"] == first["css/site.css"]
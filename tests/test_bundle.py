@@ -0,0 +1,47 @@
+import gzip
+import os
+import stat
+
+import app
+
+def home_views():
+    app.flush_analytics()
+    day = app.datetime.now(app.timezone.utc).strftime("%Y-%m-%d")
+    return app.read_analytics("default", day).get("view", {}).get("home", 0)
+
+def test_bundle_round_trip(make_app, tmp_path):
+    bundle = str(tmp_path / "site.bundle")
+    web = make_app()
+    views = home_views()
+    result = web.test_cli_runner().invoke(args=["build-bundle", "-o", bundle])
+    assert result.exit_code == 0, result.output
+    assert stat.S_IMODE(os.stat(bundle).st_mode) == 0o644
+    assert not os.path.exists(tmp_path / "cache" / "content-versions.json")    # the build never publishes
+    assert home_views() == views    # nor counts its own fetches
+
+    served = make_app(BUNDLE=bundle)
+    assert served.wsgi_app.lookup({"PATH_INFO": "/", "HTTP_HOST": "example.com"})[1] is not None
+    client = served.test_client()
+    resp = client.get("/")
+    assert resp.status_code == 200
+    assert b"<main" in resp.data
+    etag = resp.headers["ETag"]
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+    packed = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert packed.headers["ETag"] != etag    # each encoding is its own representation
+    assert gzip.decompress(packed.data) == resp.data
+
+    head = client.head("/")
+    assert head.status_code == 200
+    assert head.data == b""
+    assert head.headers["Content-Length"] == str(len(resp.data))
+
+    views = home_views()
+    client.head("/")
+    client.get("/", headers={"Sec-Purpose": "prefetch"})
+    client.get("/", headers={"Sec-Purpose": "prefetch;prerender"})
+    assert home_views() == views
+    client.get("/")
+    assert home_views() == views + 1
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports app.py in a fresh interpreter with an audit hook that records file and
+# directory access under the repo and the cache dir, and any network activity.
+PROBE = r"""
+import json, os, sys, threading
+root, cache = sys.argv[1], sys.argv[2]
+seen = []
+
+def audit(event, args):
+    if event in ("open", "os.listdir", "os.scandir", "os.mkdir") and args and isinstance(args[0], str):
+        path = os.path.abspath(args[0])
+        if path.startswith(cache) or (path.startswith(root) and not path.endswith((".py", ".pyc"))
+                                      and "__pycache__" not in path and path != root):
+            seen.append([event, path])
+    elif event.startswith("socket.") and event != "socket.__new__":
+        seen.append([event, repr(args)])
+
+sys.addaudithook(audit)
+sys.path.insert(0, root)
+import app
+print(json.dumps({"io": seen, "app": app._APP is not None, "threads": threading.active_count(),
+                  "static_dir": app.STATIC_DIR, "tenants": len(getattr(app, "TENANTS", {}) or {})}))
+"""
+
+def test_import_does_no_io_and_builds_nothing(tmp_path):
+    cache = str(tmp_path / "cache")
+    env = dict(os.environ, GOPARTNERR_CACHE_DIR=cache, GOPARTNERR_STATIC_DIR=str(tmp_path / "static"))
+    out = subprocess.run([sys.executable, "-c", PROBE, ROOT, cache], env=env, cwd=str(tmp_path),
+                         capture_output=True, text=True, timeout=60, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result["io"] == []
+    assert result["app"] is False
+    assert result["threads"] == 1
+    assert result["static_dir"] is None
+    assert result["tenants"] == 0
+    assert not os.path.exists(cache)
+
+def test_only_a_serving_process_publishes_content_versions(make_app, tmp_path, monkeypatch):
+    import app
+    web = make_app()
+    monkeypatch.setattr(app, "_BACKGROUND_PID", None)    # as in a freshly started process
+    state = tmp_path / "cache" / "content-versions.json"
+    app.internal_client(web).get("/")
+    assert not state.exists()    # build, page-weight and check-assets runs stop here
+    web.test_client().get("/healthz")
+    assert json.loads(state.read_text()) == app.TENANTS["default"].content_versions
@@ -0,0 +1,141 @@
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import app
+from loadtest import FakeSMTP, FakeWebhook
+
+@pytest.fixture
+def serve():
+    # Runs a load-test stand-in on a background thread for the test's duration
+    servers = []
+    def start(server):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def outbox(tmp_path):
+    # A LeadOutbox configured like create_app() would, with the given overrides
+    def make(**config):
+        base = dict(app.default_config(), CACHE_DIR=str(tmp_path / "cache"), LEADS_CSV=str(tmp_path / "leads.csv"),
+                    SMTP_HOST=None, SMTP_USER=None, SMTP_PASS=None, LEAD_WEBHOOK_URL=None, LEAD_BATCH_SIZE=50)
+        app.configure(dict(base, **config))
+        return app.LEADS
+    return make
+
+def smtp_config(server, **extra):
+    return dict(SMTP_HOST="127.0.0.1", SMTP_PORT=server.server_address[1], SMTP_USER="t@example.com",
+                SMTP_PASS="secret", SMTP_STARTTLS=False, SMTP_CONNECT_TIMEOUT=5, SMTP_TIMEOUT=5, **extra)
+
+def add_leads(leads, n):
+    for i in range(n):
+        leads.append({"id": f"lead-{i}", "received": "2026-01-01T00:00:00Z", "tenant": "default", "brand": "Test",
+                      "name": f"Lead {i}", "email": f"lead{i}@example.com", "message": "hello"})
+
+def rejected(leads):
+    try:
+        with open(leads.dead_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+    except FileNotFoundError:
+        return []
+
+def test_smtp_auth_failure_keeps_leads_and_trips_breaker(outbox, serve):
+    relay = serve(FakeSMTP(auth_reply="535 5.7.8 Authentication credentials invalid"))
+    leads = outbox(**smtp_config(relay, SMTP_BREAKER_THRESHOLD=1))
+    add_leads(leads, 5)
+    leads.flush()
+    smtp = leads.snapshot()["sinks"]["smtp"]
+    assert rejected(leads) == []
+    assert smtp["pending"] == 5
+    assert smtp["breaker"]["state"] == "open"
+    assert smtp["breaker"]["failures"] == 1
+
+def test_webhook_503_is_retried_and_the_outbox_compacted(outbox, serve):
+    hook = serve(FakeWebhook(statuses=[503]))
+    leads = outbox(LEAD_WEBHOOK_URL=f"http://127.0.0.1:{hook.server_address[1]}/leads",
+                   LEAD_WEBHOOK_BREAKER_THRESHOLD=1, LEAD_WEBHOOK_BREAKER_RESET=0)
+    add_leads(leads, 5)
+    leads.flush()
+    webhook = leads.snapshot()["sinks"]["webhook"]
+    assert hook.leads == []
+    assert webhook["pending"] == 5
+    assert webhook["breaker"]["state"] == "open"
+    leads.flush()    # reset_after=0: the next flush probes and succeeds
+    webhook = leads.snapshot()["sinks"]["webhook"]
+    assert [lead["id"] for lead in hook.leads] == [f"lead-{i}" for i in range(5)]
+    assert webhook["pending"] == 0
+    assert webhook["breaker"]["state"] == "closed"
+    assert rejected(leads) == []
+    assert os.path.getsize(leads.path) == 0    # every sink caught up
+    assert leads.offsets() == {}
+
+def test_partial_smtp_batch_resumes_at_first_undelivered_lead(outbox, serve):
+    relay = serve(FakeSMTP(replies=["250 OK", "250 OK", "451 4.3.0 Try again later"]))
+    leads = outbox(**smtp_config(relay))
+    add_leads(leads, 5)
+    leads.flush()
+    assert len(relay.delivered) == 2
+    assert leads.snapshot()["sinks"]["smtp"]["pending"] == 3
+    leads.flush()
+    names = [next(line for line in body.splitlines() if line.startswith("Name: ")) for body in relay.delivered]
+    assert names == [f"Name: Lead {i}" for i in range(5)]
+    assert leads.snapshot()["sinks"]["smtp"]["pending"] == 0
+    assert rejected(leads) == []
+
+def test_refused_lead_is_set_aside_alone(outbox, serve):
+    hook = serve(FakeWebhook(refuse={"lead2@example.com"}))
+    leads = outbox(LEAD_WEBHOOK_URL=f"http://127.0.0.1:{hook.server_address[1]}/leads")
+    add_leads(leads, 5)
+    leads.flush()
+    webhook = leads.snapshot()["sinks"]["webhook"]
+    assert [lead["id"] for lead in hook.leads] == ["lead-0", "lead-1", "lead-3", "lead-4"]
+    assert [(entry["sink"], entry["lead"]["id"]) for entry in rejected(leads)] == [("webhook", "lead-2")]
+    assert webhook["pending"] == 0
+    assert webhook["rejected"] == 1
+    assert webhook["breaker"]["state"] == "closed"
+
+@pytest.mark.parametrize("reply", ["451 4.7.1 Greylisted", "554 5.7.1 Relay access denied"])
+def test_smtp_recipient_refused_keeps_leads_and_trips_breaker(outbox, serve, reply):
+    relay = serve(FakeSMTP(rcpt_reply=reply))
+    leads = outbox(**smtp_config(relay, SMTP_BREAKER_THRESHOLD=1))
+    add_leads(leads, 3)
+    leads.flush()
+    smtp = leads.snapshot()["sinks"]["smtp"]
+    assert relay.delivered == []
+    assert rejected(leads) == []
+    assert smtp["pending"] == 3
+    assert smtp["rejected"] == 0
+    assert smtp["breaker"]["state"] == "open"
+
+def test_lead_export_is_scoped_to_the_tenant(tmp_path):
+    (tmp_path / "static").mkdir()
+    (tmp_path / "acme").mkdir()
+    (tmp_path / "tenants.json").write_text(json.dumps({"acme": {"hosts": ["acme.example"], "static_dir": "acme"}}))
+    web = app.create_app({"STATIC_DIR": str(tmp_path / "static"), "CACHE_DIR": str(tmp_path / "cache"),
+                          "TENANTS": str(tmp_path / "tenants.json"), "LEADS_CSV": str(tmp_path / "leads.csv"),
+                          "ADMIN_TOKEN": "t", "WARMUP": "0", "SMTP_HOST": None, "LEAD_WEBHOOK_URL": None,
+                          "PURGE_URL": None})
+    with open(tmp_path / "leads.csv", "w", encoding="utf-8") as f:
+        f.write("Name,Email,Message,Received\nOld,old@example.com,hi,\n")    # written before the Tenant column
+    app.CsvSink().send([{"name": "A", "email": "a@example.com", "message": "hi", "received": "", "tenant": "acme"},
+                        {"name": "D", "email": "d@example.com", "message": "hi", "received": "", "tenant": "default"}])
+    client, auth = web.test_client(), {"Authorization": "Bearer t"}
+    def names(**kwargs):
+        resp = client.get("/admin/leads?format=ndjson", headers=auth, **kwargs)
+        return [json.loads(line)["name"] for line in resp.get_data(as_text=True).splitlines()]
+    assert names(base_url="http://acme.example/") == ["A"]
+    assert names(base_url="http://localhost/") == ["Old", "D"]
+    assert client.get("/admin/leads?tenant=nope", headers=auth).status_code == 400
+    resp = client.get("/admin/leads?tenant=acme", headers=auth)
+    assert resp.get_data(as_text=True).splitlines() == ["Name,Email,Message,Received,Tenant", "A,a@example.com,hi,,acme"]
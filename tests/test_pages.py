@@ -0,0 +1,68 @@
+import json
+import threading
+
+import app
+
+AUTH = {"Authorization": "Bearer t"}
+
+def test_malformed_referrer_is_still_served(make_app):
+    client = make_app().test_client()
+    assert client.get("/", headers={"Referer": "http://[::1/"}).status_code == 200
+    assert app.referrer_class("http://[::1/", "example.com") == "other"
+
+def test_api_etag_changes_with_the_code(make_app, monkeypatch):
+    client = make_app().test_client()
+    etag = client.get("/api/services").headers["ETag"]
+    assert client.get("/api/services", headers={"If-None-Match": etag}).status_code == 304
+    monkeypatch.setattr(app, "APP_SOURCE_DIGEST", "redeployed")
+    resp = client.get("/api/services", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+def test_page_views_reuse_counters_across_request_threads(make_app):
+    client = make_app().test_client()
+    app.flush_analytics()    # earlier tests' counts land in this app's ANALYTICS_DIR
+    day = app.datetime.now(app.timezone.utc).strftime("%Y-%m-%d")
+    views = app.read_analytics("default", day).get("view", {}).get("home", 0)
+    before = len(app._shards)
+    threads = [threading.Thread(target=client.get, args=("/",)) for _ in range(20)]
+    for t in threads:
+        t.start()
+        t.join()
+    assert len(app._shards) <= before + 1
+    app.flush_analytics()
+    assert app.read_analytics("default", day)["view"]["home"] == views + 20
+
+def test_pages_carry_surrogate_keys_and_revalidate_by_etag(make_app):
+    client = make_app().test_client()
+    slug = app.ARTICLES[0]["slug"]
+    resp = client.get(f"/articles/{slug}")
+    assert resp.status_code == 200
+    assert resp.headers["Surrogate-Key"] == f"chrome article:{slug}"
+    assert resp.headers["Cache-Control"] == "public, no-cache"
+    etag = resp.headers["ETag"]
+    again = client.get(f"/articles/{slug}", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["Surrogate-Key"] == f"chrome article:{slug}"
+    assert client.get(f"/articles/{slug}", headers={"If-None-Match": '"other"'}).status_code == 200
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 200    # ETags are per page
+
+def test_purge_endpoint(make_app, monkeypatch):
+    client = make_app().test_client()
+    def purge(**kwargs):
+        return client.post("/admin/purge", headers=AUTH, **kwargs)
+    assert client.post("/admin/purge", json={"keys": ["chrome"]}).status_code == 401
+    assert purge(json={"keys": ["home", "chrome", "home"]}).get_json() == {"purged": ["chrome", "home"]}
+    assert app.PURGE_LOG[-1]["keys"] == ["chrome", "home"]
+    assert app.PURGE_LOG[-1]["reason"] == "manual"
+    assert purge(json={"keys": []}).get_json() == {"purged": []}
+    assert purge(json=[]).get_json() == {"purged": []}
+    assert purge(json={"keys": "chrome"}).status_code == 400
+    assert purge(json={"keys": ["chrome", 1]}).status_code == 400
+    purge()    # no keys: republish every tenant, purging only what changed since the last publish
+    assert purge().get_json() == {"purged": []}
+    monkeypatch.setattr(app.TENANTS["default"], "brand", "Renamed")
+    assert purge().get_json() == {"purged": ["chrome"]}
+    status = client.get("/admin/purge", headers=AUTH).get_json()
+    assert status["tenant"] == "default"
+    assert status["versions"] == app.TENANTS["default"].content_versions